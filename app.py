@@ -1,18 +1,30 @@
-from flask import Flask, request, jsonify, send_file, render_template, send_from_directory, redirect
+from flask import Flask, request, jsonify, send_file, render_template, send_from_directory, redirect, Response
 from flask_cors import CORS
 import os
 import threading
 import uuid
 from datetime import datetime
-from downloader import download_video
+from contextlib import nullcontext
+from downloader import download_video, URLDetector
+import hls_packager
+import thumbnail_generator
+from static_assets import AssetManifest
+from request_profiler import RequestProfiler, stage
+import game_search
+import game_diff
+import game_archive
+from bandwidth import serve_shaper, upstream_allocator
 import mimetypes
 from werkzeug.utils import secure_filename
 
 # Add MIME type for JSX files
 mimetypes.add_type('text/javascript', '.jsx')
+# Audio-only downloads (m4a is already known as audio/mp4)
+mimetypes.add_type('audio/ogg', '.opus')
 
 app = Flask(__name__)
 CORS(app)
+RequestProfiler(app)
 
 # Configuration
 DOWNLOAD_DIR = "downloads"
@@ -22,12 +34,18 @@ os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(GAMES_FOLDER, exist_ok=True)
 
+# Bundled single-page apps, indexed once at startup and served from memory
+FIRE_SIMULATOR_ASSETS = AssetManifest(os.path.join(app.root_path, 'fire-simulator', 'dist'))
+
 # Store download status in memory (for production, use a database)
 download_status = {}
+# Stop events of running tasks (live M3U8 recordings stop when theirs is set)
+stop_events = {}
 
 
-def download_task(task_id: str, url: str):
-    """Background task to download a video."""
+def download_task(task_id: str, url: str, audio_only: bool = False,
+                  max_duration=None, max_bytes=None):
+    """Background task to download a video (or only its audio track, or record a live stream)."""
     print(f"Starting download task {task_id} for URL: {url}")
     try:
         download_status[task_id]['status'] = 'downloading'
@@ -40,7 +58,31 @@ def download_task(task_id: str, url: str):
             download_status[task_id]['progress'] = min(int(percentage), 100)
             download_status[task_id]['message'] = f'Downloading... {int(percentage)}%'
         
-        result = download_video(url, DOWNLOAD_DIR, progress_callback=update_progress)
+        # Posts with several videos report the progress of each item separately
+        def update_item_progress(index, percentage):
+            items = download_status[task_id].setdefault('items', {})
+            items[str(index)] = min(int(percentage), 100)
+        
+        # Live recordings are playable while they grow, so expose the file right away
+        def update_recording(filepath, seconds, recorded_bytes):
+            download_status[task_id]['status'] = 'recording'
+            download_status[task_id]['filepath'] = filepath
+            download_status[task_id]['filename'] = os.path.basename(filepath)
+            download_status[task_id]['recorded_seconds'] = int(seconds)
+            download_status[task_id]['recorded_bytes'] = recorded_bytes
+            download_status[task_id]['message'] = f'Recording... {int(seconds)}s, {recorded_bytes / 1024 / 1024:.1f} MB'
+            if max_duration:
+                download_status[task_id]['progress'] = min(int(seconds / max_duration * 100), 100)
+        
+        # Only yt-dlp downloads honour the rate limit; FFmpeg (M3U8, live recordings) can't be
+        # throttled, so those jobs don't take a share of the upstream bandwidth
+        throttled = URLDetector.is_youtube_url(url) or URLDetector.is_twitter_url(url)
+        with upstream_allocator.job(task_id) if throttled else nullcontext() as upstream_job:
+            result = download_video(url, DOWNLOAD_DIR, progress_callback=update_progress, audio_only=audio_only,
+                                    stop_event=stop_events.get(task_id), max_duration=max_duration,
+                                    max_bytes=max_bytes, recording_callback=update_recording,
+                                    ratelimit_provider=upstream_job.current_limit if upstream_job else None,
+                                    item_progress_callback=update_item_progress)
         print(f"Task {task_id}: Download result: {result}")
         
         if result['success']:
@@ -50,7 +92,17 @@ def download_task(task_id: str, url: str):
             download_status[task_id]['filename'] = os.path.basename(result['filepath'])
             download_status[task_id]['type'] = result['type']
             download_status[task_id]['progress'] = 100
+            if 'reason' in result:
+                download_status[task_id]['reason'] = result['reason']
+            if 'files' in result:
+                download_status[task_id]['files'] = [
+                    dict(item, filename=os.path.basename(item['filepath']) if item['filepath'] else None)
+                    for item in result['files']
+                ]
             print(f"Task {task_id}: Completed successfully")
+            
+            if not audio_only:
+                thumbnail_generator.queue_thumbnails(result['filepath'])
         else:
             download_status[task_id]['status'] = 'failed'
             download_status[task_id]['message'] = result['message']
@@ -65,6 +117,8 @@ def download_task(task_id: str, url: str):
         print(f"Task {task_id}: Exception - {error_msg}")
         import traceback
         traceback.print_exc()
+    finally:
+        stop_events.pop(task_id, None)
 
 
 @app.route('/')
@@ -104,7 +158,10 @@ def start_download():
     
     Expected JSON body:
     {
-        "url": "https://youtube.com/watch?v=..."
+        "url": "https://youtube.com/watch?v=...",
+        "audio_only": false (optional, download only the audio track),
+        "max_duration": 3600 (optional, seconds, live M3U8 recordings only),
+        "max_bytes": 1073741824 (optional, live M3U8 recordings only)
     }
     
     Returns:
@@ -122,6 +179,12 @@ def start_download():
         return jsonify({'error': 'Missing URL parameter'}), 400
     
     url = data['url']
+    audio_only = bool(data.get('audio_only', False))
+    try:
+        max_duration = float(data['max_duration']) if data.get('max_duration') else None
+        max_bytes = int(data['max_bytes']) if data.get('max_bytes') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid max_duration or max_bytes'}), 400
     
     # Generate unique task ID
     task_id = str(uuid.uuid4())
@@ -135,13 +198,17 @@ def start_download():
         'filepath': None,
         'filename': None,
         'type': None,
+        'audio_only': audio_only,
         'progress': 0
     }
     
+    stop_events[task_id] = threading.Event()
+    
     # Start download in background thread
-    thread = threading.Thread(target=download_task, args=(task_id, url))
-    thread.daemon = True
-    thread.start()
+    with stage('spawn_worker'):
+        thread = threading.Thread(target=download_task, args=(task_id, url, audio_only, max_duration, max_bytes))
+        thread.daemon = True
+        thread.start()
     
     return jsonify({
         'task_id': task_id,
@@ -156,11 +223,13 @@ def get_status(task_id):
     
     Returns:
     {
-        "status": "pending|downloading|completed|failed",
+        "status": "pending|downloading|recording|completed|failed",
         "message": "Status message",
         "filepath": "/path/to/file" (if completed),
         "filename": "filename.mp4" (if completed),
-        "type": "youtube|twitter|m3u8" (if completed)
+        "type": "youtube|twitter|m3u8" (if completed),
+        "files": [{"index", "filepath", "filename", "size", "title", "error"}] (Twitter/X, if completed),
+        "items": {"0": 100, "1": 42} (per-item progress of multi-video Twitter/X posts)
     }
     """
     if task_id not in download_status:
@@ -169,50 +238,217 @@ def get_status(task_id):
     return jsonify(download_status[task_id])
 
 
-@app.route('/api/download/<task_id>', methods=['GET'])
-def download_file(task_id):
+@app.route('/api/stop/<task_id>', methods=['POST'])
+def stop_task(task_id):
     """
-    Download the completed video file.
+    Stop a live M3U8 recording. The file is finalized and the task completes normally.
     """
     if task_id not in download_status:
         return jsonify({'error': 'Task not found'}), 404
     
+    if task_id not in stop_events:
+        return jsonify({'error': 'Task is not running'}), 400
+    
+    # Only live recordings watch the stop event; other downloads would ignore it
+    if download_status[task_id]['status'] != 'recording':
+        return jsonify({'error': 'Task is not a live recording'}), 400
+    
+    stop_events[task_id].set()
+    return jsonify({'task_id': task_id, 'message': 'Stopping...'}), 202
+
+
+def get_completed_filepath(task_id: str, allow_recording: bool = False):
+    """
+    Look up the file of a completed download task.
+    
+    Args:
+        allow_recording: Also accept live recordings still in progress (fragmented MP4)
+    
+    Returns:
+        (filepath, None) on success, or (None, error_response) to return to the client
+    """
+    if task_id not in download_status:
+        return None, (jsonify({'error': 'Task not found'}), 404)
+    
     task = download_status[task_id]
     
-    if task['status'] != 'completed':
-        return jsonify({'error': 'Download not completed yet'}), 400
+    if task['status'] != 'completed' and not (allow_recording and task['status'] == 'recording'):
+        return None, (jsonify({'error': 'Download not completed yet'}), 400)
     
     if not task['filepath'] or not os.path.exists(task['filepath']):
+        return None, (jsonify({'error': 'File not found'}), 404)
+    
+    return task['filepath'], None
+
+
+@app.route('/api/download/<task_id>', methods=['GET'])
+def download_file(task_id):
+    """
+    Download the completed video file.
+    """
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    response = send_file(
+        filepath,
+        as_attachment=True,
+        download_name=download_status[task_id]['filename']
+    )
+    return serve_shaper.shape(response, request.remote_addr, 'bulk')
+
+
+@app.route('/api/download/<task_id>/<int:index>', methods=['GET'])
+def download_item_file(task_id, index):
+    """
+    Download one item of a completed multi-video Twitter/X post.
+    """
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    files = download_status[task_id].get('files') or []
+    if index < 0 or index >= len(files) or not files[index]['filepath'] or not os.path.exists(files[index]['filepath']):
         return jsonify({'error': 'File not found'}), 404
     
-    return send_file(
-        task['filepath'],
+    response = send_file(
+        files[index]['filepath'],
         as_attachment=True,
-        download_name=task['filename']
+        download_name=files[index]['filename']
     )
+    return serve_shaper.shape(response, request.remote_addr, 'bulk')
 
 
 @app.route('/api/stream/<task_id>', methods=['GET'])
 def stream_video(task_id):
     """
-    Stream the completed video file for playback in browser.
+    Stream the completed video (or audio) file for playback in browser.
+    Live recordings can be streamed while they are still being written.
     """
-    if task_id not in download_status:
-        return jsonify({'error': 'Task not found'}), 404
+    filepath, error = get_completed_filepath(task_id, allow_recording=True)
+    if error:
+        return error
     
-    task = download_status[task_id]
+    response = send_file(
+        filepath,
+        mimetype=mimetypes.guess_type(filepath)[0] or 'video/mp4',
+        as_attachment=False
+    )
+    # Playback gets a larger share of the bandwidth than bulk downloads
+    return serve_shaper.shape(response, request.remote_addr, 'interactive')
+
+
+@app.route('/api/hls/<task_id>/master.m3u8', methods=['GET'])
+def hls_master_playlist(task_id):
+    """
+    HLS master playlist for a completed download (adaptive playback).
     
-    if task['status'] != 'completed':
-        return jsonify({'error': 'Download not completed yet'}), 400
+    Segments are cut lazily with stream copy on first request and cached next to the file.
+    Requesting the master playlist also starts generating a low-bitrate rendition in the
+    background; it is listed here once ready.
+    """
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
     
-    if not task['filepath'] or not os.path.exists(task['filepath']):
-        return jsonify({'error': 'File not found'}), 404
+    try:
+        hls_packager.start_low_rendition(filepath)
+        playlist = hls_packager.build_master_playlist(filepath)
+    except Exception as e:
+        return jsonify({'error': f'Failed to prepare HLS playlist: {str(e)}'}), 500
     
-    return send_file(
-        task['filepath'],
-        mimetype='video/mp4',
-        as_attachment=False
-    )
+    return Response(playlist, mimetype='application/vnd.apple.mpegurl',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/api/hls/<task_id>/source.m3u8', methods=['GET'])
+def hls_media_playlist(task_id):
+    """HLS media playlist of the original-quality rendition."""
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    try:
+        playlist = hls_packager.build_media_playlist(filepath)
+    except Exception as e:
+        return jsonify({'error': f'Failed to prepare HLS playlist: {str(e)}'}), 500
+    
+    return Response(playlist, mimetype='application/vnd.apple.mpegurl')
+
+
+@app.route('/api/hls/<task_id>/source/<int:index>.ts', methods=['GET'])
+def hls_segment(task_id, index):
+    """A single MPEG-TS segment of the original-quality rendition."""
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    try:
+        segment_path = hls_packager.get_segment(filepath, index)
+    except Exception as e:
+        return jsonify({'error': f'Failed to create segment: {str(e)}'}), 500
+    
+    if not segment_path:
+        return jsonify({'error': 'Segment not found'}), 404
+    
+    response = send_file(segment_path, mimetype='video/mp2t')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/api/hls/<task_id>/low/<path:filename>', methods=['GET'])
+def hls_low_rendition(task_id, filename):
+    """Playlist and segments of the background-generated low-bitrate rendition."""
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    if not hls_packager.is_low_rendition_ready(filepath):
+        return jsonify({'error': 'Low-bitrate rendition not ready yet'}), 404
+    
+    return send_from_directory(hls_packager.get_low_rendition_dir(filepath), filename)
+
+
+@app.route('/api/thumb/<task_id>', methods=['GET'])
+@app.route('/api/thumb/<task_id>/<name>', methods=['GET'])
+def get_thumbnail(task_id, name='thumb.jpg'):
+    """
+    Serve the cached thumbnails of a completed download.
+    
+    Available names: thumb.jpg (default), poster.jpg, sprite.jpg and sprite.vtt
+    (WebVTT index of the seek-preview sprite). They are generated in the background
+    after the download completes, so this returns 404 until they are ready (and for
+    audio-only files or files FFmpeg couldn't process).
+    """
+    if name not in thumbnail_generator.THUMBNAIL_FILES:
+        return jsonify({'error': 'Unknown thumbnail'}), 404
+    
+    filepath, error = get_completed_filepath(task_id)
+    if error:
+        return error
+    
+    if thumbnail_generator.is_unavailable(filepath):
+        return jsonify({'error': 'No thumbnails for this file'}), 404
+    
+    if not thumbnail_generator.is_ready(filepath):
+        thumbnail_generator.queue_thumbnails(filepath)
+        return jsonify({'error': 'Thumbnails not ready yet'}), 404
+    
+    response = send_from_directory(thumbnail_generator.get_thumbnail_dir(filepath), name)
+    # Task IDs are unique per download, so the content behind this URL never changes
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/api/bandwidth', methods=['GET'])
+def bandwidth_metrics():
+    """
+    Current bandwidth allocation: served transfers per client and upstream download jobs.
+    """
+    return jsonify({
+        'serve': serve_shaper.metrics(),
+        'upstream': upstream_allocator.metrics()
+    })
 
 
 @app.route('/api/health', methods=['GET'])
@@ -256,6 +492,8 @@ def save_game():
     file_path = os.path.join(game_dir, filename)
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(html)
+    game_search.queue_index(secure_filename(game_id), filename, file_path)
+    game_diff.precompute_previous_diff(game_dir, filename)
     return jsonify({'success': True, 'path': f"/{GAMES_FOLDER}/{secure_filename(game_id)}/{filename}"})
 
 
@@ -269,14 +507,67 @@ def list_game_versions(game_id):
     return jsonify({'versions': versions})
 
 
+@app.route('/search-games', methods=['GET'])
+def search_games():
+    """
+    Full-text search over all saved game versions (game ID, version, title, text and scripts).
+    
+    Query parameters: q (required), limit (default 20, max 100), game_id (optional filter)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing q parameter'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    game_id = request.args.get('game_id')
+    
+    with stage('search'):
+        hits = game_search.search_games(query, limit=limit,
+                                        game_id=secure_filename(game_id) if game_id else None)
+    return jsonify({'query': query, 'results': hits})
+
+
 @app.route('/get-game/<game_id>/<version>', methods=['GET'])
 def get_game_version(game_id, version):
     game_dir = os.path.join(GAMES_FOLDER, secure_filename(game_id))
     safe_version = secure_filename(version)
     file_path = os.path.join(game_dir, safe_version)
-    if not os.path.exists(file_path):
-        return jsonify({'error': 'Game version not found'}), 404
-    return send_from_directory(game_dir, safe_version)
+    with stage('lookup'):
+        if not os.path.exists(file_path):
+            return jsonify({'error': 'Game version not found'}), 404
+    with stage('send'):
+        return send_from_directory(game_dir, safe_version)
+
+
+@app.route('/diff-game/<game_id>/<from_version>/<to_version>', methods=['GET'])
+def diff_game_versions(game_id, from_version, to_version):
+    """
+    Line diff between two saved versions of a game, computed and cached server-side.
+    
+    Returns JSON hunks by default, or a unified diff with ?format=unified.
+    """
+    game_dir = os.path.join(GAMES_FOLDER, secure_filename(game_id))
+    safe_versions = []
+    for version in (from_version, to_version):
+        safe_version = secure_filename(version if version.endswith('.html') else f"{version}.html")
+        if not os.path.exists(os.path.join(game_dir, safe_version)):
+            return jsonify({'error': f'Game version not found: {version}'}), 404
+        safe_versions.append(safe_version)
+    
+    with stage('diff'):
+        diff = game_diff.get_diff(os.path.join(game_dir, safe_versions[0]),
+                                  os.path.join(game_dir, safe_versions[1]))
+    
+    if request.args.get('format') == 'unified':
+        response = Response(game_diff.format_unified(diff, *safe_versions), mimetype='text/plain')
+    else:
+        response = jsonify({'from': safe_versions[0], 'to': safe_versions[1], **diff})
+    # Same content-hash pair, same diff: let the browser revalidate cheaply
+    response.set_etag(f"{diff['from_hash']}_{diff['to_hash']}_{request.args.get('format', 'json')}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/delete-game/<game_id>/<version>', methods=['DELETE'])
@@ -290,25 +581,65 @@ def delete_game_version(game_id, version):
     
     try:
         os.remove(file_path)
+        game_search.queue_remove(secure_filename(game_id), safe_version)
         return jsonify({'success': True, 'message': 'Game version deleted'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/export-games', methods=['GET'])
+def export_games():
+    """
+    Stream a tar archive of games (all versions plus the uploaded images they use).
+    
+    Query parameters: ids (comma-separated game IDs, default: all games)
+    """
+    ids = request.args.get('ids', '')
+    game_ids = [i.strip() for i in ids.split(',') if i.strip()] or game_archive.list_game_ids(GAMES_FOLDER)
+    
+    response = Response(
+        game_archive.iter_export(game_ids, GAMES_FOLDER, UPLOAD_FOLDER),
+        mimetype='application/x-tar',
+        direct_passthrough=True
+    )
+    response.headers['Content-Disposition'] = f"attachment; filename=games-{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar"
+    return response
+
+
+@app.route('/import-games', methods=['POST'])
+def import_games():
+    """
+    Import a tar archive created by /export-games (raw request body or an 'archive' file field).
+    
+    Existing files are kept unless ?overwrite=1 is passed.
+    """
+    stream = request.files['archive'].stream if 'archive' in request.files else request.stream
+    overwrite = request.args.get('overwrite') == '1'
+    
+    try:
+        result = game_archive.import_archive(stream, GAMES_FOLDER, UPLOAD_FOLDER, overwrite=overwrite)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    for name in result['imported']:
+        if name.startswith('games/'):
+            _, game_id, version = name.split('/')
+            game_search.queue_index(game_id, version, os.path.join(GAMES_FOLDER, game_id, version))
+    
+    return jsonify({'success': True, **result})
+
+
 @app.route('/fire-simulator')
 def serve_fire_simulator_redirect():
     return redirect('/fire-simulator/')
 
 @app.route('/fire-simulator/')
 def serve_fire_simulator_index():
-    # Use os.path.abspath to ensure correct path
-    dist_dir = os.path.join(os.getcwd(), 'fire-simulator', 'dist')
-    return send_from_directory(dist_dir, 'index.html')
+    return FIRE_SIMULATOR_ASSETS.serve('index.html')
 
 @app.route('/fire-simulator/<path:filename>')
 def serve_fire_simulator_files(filename):
-    dist_dir = os.path.join(os.getcwd(), 'fire-simulator', 'dist')
-    return send_from_directory(dist_dir, filename)
+    return FIRE_SIMULATOR_ASSETS.serve(filename)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from werkzeug.wsgi import ClosingIterator
+
+# --- Configuration (environment variables, bytes/sec, 0 = unlimited) ---
+# Served bytes (/api/stream, /api/download/<task_id>)
+SERVE_RATE_TOTAL = int(os.environ.get('SERVE_RATE_TOTAL', '0'))
+SERVE_RATE_PER_CLIENT = int(os.environ.get('SERVE_RATE_PER_CLIENT', '0'))
+# Upstream fetches by yt-dlp (YouTube / Twitter downloads)
+UPSTREAM_RATE_TOTAL = int(os.environ.get('UPSTREAM_RATE_TOTAL', '0'))
+UPSTREAM_RATE_PER_JOB = int(os.environ.get('UPSTREAM_RATE_PER_JOB', '0'))
+
+# Share of the bandwidth each kind of transfer gets relative to the others:
+# an interactive stream gets three times the allocation of a bulk download
+TRANSFER_WEIGHTS = {
+    'interactive': 3,
+    'bulk': 1,
+}
+
+# Minimum bucket size, so small rates still allow reasonably sized writes
+MIN_BURST_BYTES = 64 * 1024
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. consume() blocks until the bytes fit in the rate.
+
+    A rate of 0 means unlimited. The rate can be changed while transfers are running.
+    """
+
+    def __init__(self, rate: float = 0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.capacity = MIN_BURST_BYTES
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            # Allow bursts of a quarter of a second of traffic
+            self.capacity = max(rate / 4, MIN_BURST_BYTES)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def consume(self, amount: int):
+        """Takes `amount` tokens, sleeping for as long as the bucket is in debt."""
+        with self.lock:
+            if self.rate <= 0:
+                return
+            self._refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Transfer:
+    """One response being served to a client, throttled by its own bucket."""
+
+    def __init__(self, client: str, kind: str):
+        self.client = client
+        self.kind = kind
+        self.weight = TRANSFER_WEIGHTS.get(kind, 1)
+        self.bucket = TokenBucket()
+        self.bytes_sent = 0
+        self.started = time.monotonic()
+        self.closed = False
+
+
+class ServeShaper:
+    """
+    Weighted fair sharing of the served bandwidth between active transfers.
+
+    The global rate is split between all active transfers by weight, and each client's
+    transfers together never exceed the per-client rate. Allocations are recomputed
+    whenever a transfer starts or ends, so one heavy client can't starve the others.
+    """
+
+    def __init__(self, total_rate: int = SERVE_RATE_TOTAL, per_client_rate: int = SERVE_RATE_PER_CLIENT):
+        self.total_rate = total_rate
+        self.per_client_rate = per_client_rate
+        self.transfers = []
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.total_rate > 0 or self.per_client_rate > 0
+
+    def _rebalance(self):
+        total_weight = sum(t.weight for t in self.transfers)
+        client_weights = {}
+        for transfer in self.transfers:
+            client_weights[transfer.client] = client_weights.get(transfer.client, 0) + transfer.weight
+
+        for transfer in self.transfers:
+            limits = []
+            if self.total_rate > 0:
+                limits.append(self.total_rate * transfer.weight / total_weight)
+            if self.per_client_rate > 0:
+                limits.append(self.per_client_rate * transfer.weight / client_weights[transfer.client])
+            transfer.bucket.set_rate(min(limits) if limits else 0)
+
+    def open(self, client: str, kind: str) -> Transfer:
+        transfer = Transfer(client, kind)
+        with self.lock:
+            self.transfers.append(transfer)
+            self._rebalance()
+        return transfer
+
+    def close(self, transfer: Transfer):
+        with self.lock:
+            if transfer in self.transfers:
+                self.transfers.remove(transfer)
+                self._rebalance()
+
+    def _throttled(self, body, transfer: Transfer):
+        try:
+            for chunk in body:
+                transfer.bucket.consume(len(chunk))
+                transfer.bytes_sent += len(chunk)
+                yield chunk
+        finally:
+            self._release(body, transfer)
+
+    def _release(self, body, transfer: Transfer):
+        """Ends a transfer (idempotent): frees its share and closes the wrapped body."""
+        if transfer.closed:
+            return
+        transfer.closed = True
+        self.close(transfer)
+        if hasattr(body, 'close'):
+            body.close()
+
+    def shape(self, response, client: str, kind: str = 'bulk'):
+        """
+        Throttles the body of a Flask response according to the client's fair share.
+
+        Args:
+            response: The response to throttle (e.g. from send_file)
+            client: Client identifier (remote address)
+            kind: 'interactive' (playback) or 'bulk' (file download)
+
+        Returns:
+            The same response, with its body wrapped when shaping is enabled
+        """
+        if not self.enabled or response.status_code not in (200, 206):
+            return response
+        transfer = self.open(client, kind)
+        body = response.response
+        # send_file responses use direct_passthrough, where werkzeug hands the iterable
+        # to the server as-is and never calls response.close(). The ClosingIterator is
+        # closed by the server when the body is finished or the client disconnects.
+        response.response = ClosingIterator(self._throttled(body, transfer),
+                                            lambda: self._release(body, transfer))
+        return response
+
+    def metrics(self) -> dict:
+        """Current allocation of every active transfer."""
+        with self.lock:
+            transfers = list(self.transfers)
+        now = time.monotonic()
+        return {
+            'total_rate': self.total_rate,
+            'per_client_rate': self.per_client_rate,
+            'transfers': [
+                {
+                    'client': t.client,
+                    'kind': t.kind,
+                    'allocated_rate': int(t.bucket.rate),
+                    'bytes_sent': t.bytes_sent,
+                    'average_rate': int(t.bytes_sent / max(now - t.started, 0.001)),
+                }
+                for t in transfers
+            ],
+        }
+
+
+class UpstreamJob:
+    """An upstream download job; current_limit() is its share of the upstream bandwidth."""
+
+    def __init__(self, allocator, name: str):
+        self.allocator = allocator
+        self.name = name
+
+    def current_limit(self):
+        """Returns the job's rate limit in bytes/sec, or None if unlimited."""
+        return self.allocator.limit_for_job()
+
+
+class UpstreamAllocator:
+    """Splits the upstream (yt-dlp) bandwidth evenly between running download jobs."""
+
+    def __init__(self, total_rate: int = UPSTREAM_RATE_TOTAL, per_job_rate: int = UPSTREAM_RATE_PER_JOB):
+        self.total_rate = total_rate
+        self.per_job_rate = per_job_rate
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def limit_for_job(self):
+        with self.lock:
+            job_count = max(len(self.jobs), 1)
+        limits = []
+        if self.total_rate > 0:
+            limits.append(self.total_rate // job_count)
+        if self.per_job_rate > 0:
+            limits.append(self.per_job_rate)
+        return min(limits) if limits else None
+
+    @contextmanager
+    def job(self, name: str):
+        """Registers a running download job for the duration of the with-block."""
+        job = UpstreamJob(self, name)
+        with self.lock:
+            self.jobs.append(job)
+        try:
+            yield job
+        finally:
+            with self.lock:
+                self.jobs.remove(job)
+
+    def metrics(self) -> dict:
+        """Current upstream allocation of every running job."""
+        with self.lock:
+            names = [job.name for job in self.jobs]
+        limit = self.limit_for_job()
+        return {
+            'total_rate': self.total_rate,
+            'per_job_rate': self.per_job_rate,
+            'jobs': [{'name': name, 'allocated_rate': limit} for name in names],
+        }
+
+
+serve_shaper = ServeShaper()
+upstream_allocator = UpstreamAllocator()
@@ -9,6 +9,7 @@ try:
     from youtube_downloader import download_youtube_video
     from twitter_downloader import download_twitter_video
     from m3u8_converter import convert_m3u8_to_mp4
+    from live_recorder import is_live_m3u8, record_live_hls
 except ImportError:
     # Fallback for when modules are in the same directory
     import sys
@@ -16,6 +17,7 @@ except ImportError:
     from youtube_downloader import download_youtube_video
     from twitter_downloader import download_twitter_video
     from m3u8_converter import convert_m3u8_to_mp4
+    from live_recorder import is_live_m3u8, record_live_hls
 
 
 class URLDetector:
@@ -48,7 +50,10 @@ class URLDetector:
         return url.lower().endswith('.m3u8') or 'm3u8' in url.lower()
 
 
-def download_video(url: str, output_dir: str = "downloads", progress_callback=None) -> Dict:
+def download_video(url: str, output_dir: str = "downloads", progress_callback=None,
+                   audio_only: bool = False, stop_event=None, max_duration: Optional[float] = None,
+                   max_bytes: Optional[int] = None, recording_callback=None,
+                   ratelimit_provider=None, item_progress_callback=None) -> Dict:
     """
     Automatically detects the video source and downloads using the appropriate method.
     
@@ -56,14 +61,26 @@ def download_video(url: str, output_dir: str = "downloads", progress_callback=No
         url: The video URL (YouTube, Twitter/X, or M3U8)
         output_dir: Directory where the video will be saved (default: "downloads")
         progress_callback: Optional callback function for progress updates
+        audio_only: Only download the audio track (m4a/opus, no video merge)
+        stop_event: Optional threading.Event that stops a live M3U8 recording when set
+        max_duration: Optional maximum duration (seconds) of a live M3U8 recording
+        max_bytes: Optional maximum size (bytes) of a live M3U8 recording
+        recording_callback: Optional callback(filepath, seconds, bytes) for live recording progress
+        ratelimit_provider: Optional callable returning the current upstream rate limit (bytes/sec)
+                            for YouTube/Twitter downloads
+        item_progress_callback: Optional callback(index, percentage) for each media item of a
+                                Twitter/X post with several videos
         
     Returns:
-        A dictionary with 'success' (bool), 'filepath' (str), 'message' (str), and 'type' (str)
+        A dictionary with 'success' (bool), 'filepath' (str), 'message' (str), and 'type' (str);
+        Twitter/X results also list every downloaded item in 'files'
     """
     print(f"\n{'='*60}")
     print(f"UNIVERSAL VIDEO DOWNLOADER")
     print(f"{'='*60}")
     print(f"Analyzing URL: {url}")
+    if audio_only:
+        print("Mode: audio only")
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
@@ -73,13 +90,16 @@ def download_video(url: str, output_dir: str = "downloads", progress_callback=No
     # Detect URL type and route to appropriate downloader
     if detector.is_youtube_url(url):
         print("Detected: YouTube video")
-        result = download_youtube_video(url, output_dir, progress_callback)
+        result = download_youtube_video(url, output_dir, progress_callback, audio_only=audio_only,
+                                        ratelimit_provider=ratelimit_provider)
         result['type'] = 'youtube'
         return result
         
     elif detector.is_twitter_url(url):
         print("Detected: Twitter/X video")
-        result = download_twitter_video(url, output_dir, progress_callback)
+        result = download_twitter_video(url, output_dir, progress_callback, audio_only=audio_only,
+                                        ratelimit_provider=ratelimit_provider,
+                                        item_progress_callback=item_progress_callback)
         result['type'] = 'twitter'
         return result
         
@@ -88,10 +108,61 @@ def download_video(url: str, output_dir: str = "downloads", progress_callback=No
         # Generate a filename based on URL or timestamp
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = os.path.join(output_dir, f"m3u8_video_{timestamp}.mp4")
+        if audio_only:
+            output_file = os.path.join(output_dir, f"m3u8_audio_{timestamp}.m4a")
+        else:
+            output_file = os.path.join(output_dir, f"m3u8_video_{timestamp}.mp4")
+        
+        if is_live_m3u8(url):
+            print("Detected: live stream, recording to fragmented MP4")
+            output_file = output_file.replace('m3u8_video_', 'm3u8_live_').replace('m3u8_audio_', 'm3u8_live_audio_')
+            
+            def on_segment(seconds, recorded_bytes):
+                if recording_callback:
+                    recording_callback(os.path.abspath(output_file), seconds, recorded_bytes)
+            
+            # Mark the task as a live recording right away, so it can be stopped before the first segment
+            on_segment(0, 0)
+            try:
+                stats = record_live_hls(url, output_file, stop_event=stop_event,
+                                        max_duration=max_duration, max_bytes=max_bytes,
+                                        recording_callback=on_segment, audio_only=audio_only)
+            except Exception as e:
+                if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+                    # Keep what was recorded before the failure
+                    return {
+                        'success': True,
+                        'filepath': os.path.abspath(output_file),
+                        'message': f'Live recording interrupted, partial recording kept ({str(e)})',
+                        'reason': str(e),
+                        'type': 'm3u8'
+                    }
+                return {
+                    'success': False,
+                    'filepath': None,
+                    'message': f'Live recording failed: {str(e)}',
+                    'type': 'm3u8'
+                }
+            
+            if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+                skipped = f", {stats['skipped_segments']} segments skipped" if stats['skipped_segments'] else ''
+                return {
+                    'success': True,
+                    'filepath': os.path.abspath(output_file),
+                    'message': f"Recorded {stats['duration']:.0f}s of live stream ({stats['reason']}{skipped})",
+                    'reason': stats['reason'],
+                    'type': 'm3u8'
+                }
+            return {
+                'success': False,
+                'filepath': None,
+                'message': f"Live recording produced no data ({stats['reason']})",
+                'type': 'm3u8'
+            }
         
         try:
-            convert_m3u8_to_mp4(url, output_file)
+            # In audio-only mode the extension follows the audio codec (.m4a, .mp3, .opus, ...)
+            output_file = convert_m3u8_to_mp4(url, output_file, audio_only=audio_only)
             # Check if file was created successfully
             if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
                 return {
@@ -129,8 +200,11 @@ def download_video(url: str, output_dir: str = "downloads", progress_callback=No
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) < 2:
-        print("Usage: python downloader.py <VIDEO_URL> [OUTPUT_DIR]")
+    audio_only_mode = '--audio-only' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--audio-only']
+    
+    if not args:
+        print("Usage: python downloader.py <VIDEO_URL> [OUTPUT_DIR] [--audio-only]")
         print("\nSupported sources:")
         print("  - YouTube (youtube.com, youtu.be)")
         print("  - Twitter/X (twitter.com, x.com)")
@@ -139,12 +213,13 @@ if __name__ == "__main__":
         print("python downloader.py https://www.youtube.com/watch?v=dQw4w9WgXcQ")
         print("python downloader.py https://twitter.com/user/status/1234567890 my_videos")
         print("python downloader.py https://example.com/video/playlist.m3u8")
+        print("python downloader.py https://www.youtube.com/watch?v=dQw4w9WgXcQ --audio-only")
         sys.exit(1)
     
-    video_url = sys.argv[1]
-    output_directory = sys.argv[2] if len(sys.argv) > 2 else "downloads"
+    video_url = args[0]
+    output_directory = args[1] if len(args) > 1 else "downloads"
     
-    result = download_video(video_url, output_directory)
+    result = download_video(video_url, output_directory, audio_only=audio_only_mode)
     
     print(f"\n{'='*60}")
     if result['success']:
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tarfile
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+# --- Configuration ---
+GAMES_FOLDER = 'games'
+UPLOAD_FOLDER = os.path.join('static', 'uploads')
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = 'MANIFEST.json'
+MAX_MANIFEST_BYTES = 64 * 1024 * 1024
+MAX_IMPORT_BYTES = 4 * 1024 * 1024 * 1024
+
+# Images uploaded through /upload-image are referenced from the game HTML by URL
+UPLOAD_REFERENCE_PATTERN = re.compile(rb'/static/uploads/([A-Za-z0-9_.-]+)')
+REFERENCE_OVERLAP = 256
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+RECORD_SIZE = tarfile.RECORDSIZE
+
+
+def list_game_ids(games_folder: str = GAMES_FOLDER) -> list:
+    """Returns all game IDs (folders under games/, skipping internal dot-folders)."""
+    if not os.path.isdir(games_folder):
+        return []
+    return sorted(
+        name for name in os.listdir(games_folder)
+        if not name.startswith('.') and os.path.isdir(os.path.join(games_folder, name))
+    )
+
+
+def _tar_header(name: str, size: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8')
+
+
+def _padding(size: int) -> bytes:
+    remainder = size % BLOCK_SIZE
+    return b'\0' * (BLOCK_SIZE - remainder) if remainder else b''
+
+
+def _stream_file(file_path: str, archive_name: str, manifest: dict, references: set = None):
+    """Yields the tar entry of one file chunk by chunk, recording its hash in the manifest."""
+    stat = os.stat(file_path)
+    yield _tar_header(archive_name, stat.st_size, stat.st_mtime)
+
+    digest = hashlib.sha256()
+    written = 0
+    tail = b''
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            # The file may change while it's being read; never emit more than the header announced
+            chunk = chunk[:stat.st_size - written]
+            if not chunk:
+                break
+            digest.update(chunk)
+            written += len(chunk)
+            if references is not None:
+                for match in UPLOAD_REFERENCE_PATTERN.finditer(tail + chunk):
+                    references.add(match.group(1).decode('ascii'))
+                tail = chunk[-REFERENCE_OVERLAP:]
+            yield chunk
+
+    if written < stat.st_size:
+        raise IOError(f"{file_path} was truncated while exporting")
+    yield _padding(stat.st_size)
+    manifest[archive_name] = {'size': stat.st_size, 'sha256': digest.hexdigest()}
+
+
+def iter_export(game_ids: list, games_folder: str = GAMES_FOLDER, upload_folder: str = UPLOAD_FOLDER):
+    """
+    Streams a tar archive of the given games: every saved version plus the uploaded
+    images they reference, followed by a MANIFEST.json with the SHA-256 of every entry.
+
+    Headers and file chunks are yielded as they are produced, so memory use stays
+    constant regardless of the library size.
+
+    Args:
+        game_ids: Game IDs to export
+        games_folder: Folder holding the saved games
+        upload_folder: Folder holding uploaded images
+
+    Yields:
+        Chunks of the tar archive
+    """
+    manifest = {}
+    references = set()
+    total = 0
+
+    for game_id in game_ids:
+        game_dir = os.path.join(games_folder, secure_filename(game_id))
+        if not os.path.isdir(game_dir):
+            continue
+        for version in sorted(os.listdir(game_dir)):
+            if not version.endswith('.html'):
+                continue
+            archive_name = f"games/{secure_filename(game_id)}/{version}"
+            for chunk in _stream_file(os.path.join(game_dir, version), archive_name, manifest, references):
+                total += len(chunk)
+                yield chunk
+
+    for upload_name in sorted(references):
+        safe_name = secure_filename(upload_name)
+        upload_path = os.path.join(upload_folder, safe_name)
+        if safe_name and os.path.isfile(upload_path):
+            for chunk in _stream_file(upload_path, f"static/uploads/{safe_name}", manifest):
+                total += len(chunk)
+                yield chunk
+
+    manifest_data = json.dumps({'files': manifest}, indent=1).encode('utf-8')
+    for chunk in (_tar_header(MANIFEST_NAME, len(manifest_data), time.time()), manifest_data,
+                  _padding(len(manifest_data))):
+        total += len(chunk)
+        yield chunk
+
+    # End-of-archive marker (two zero blocks), padded to a full record
+    end = b'\0' * (2 * BLOCK_SIZE)
+    total += len(end)
+    yield end + b'\0' * (-total % RECORD_SIZE)
+
+
+def _destination(archive_name: str, games_folder: str, upload_folder: str):
+    """Maps an archive entry to its final path, rejecting anything outside the expected layout."""
+    parts = archive_name.split('/')
+    if len(parts) == 3 and parts[0] == 'games' and parts[2].endswith('.html'):
+        game_id, version = secure_filename(parts[1]), secure_filename(parts[2])
+        if game_id == parts[1] and version == parts[2] and not game_id.startswith('.'):
+            return os.path.join(games_folder, game_id, version)
+    if len(parts) == 3 and parts[:2] == ['static', 'uploads']:
+        name = secure_filename(parts[2])
+        if name and name == parts[2]:
+            return os.path.join(upload_folder, name)
+    return None
+
+
+def parse_manifest(data: bytes) -> dict:
+    """
+    Parses and validates MANIFEST.json: {"files": {name: {"size": int, "sha256": str}}}.
+
+    Raises:
+        ValueError: If the manifest is not valid JSON or doesn't have that shape
+    """
+    try:
+        manifest = json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise ValueError('Manifest is not valid JSON')
+
+    files = manifest.get('files') if isinstance(manifest, dict) else None
+    if not isinstance(files, dict):
+        raise ValueError('Manifest has no files map')
+    for name, entry in files.items():
+        if not (isinstance(entry, dict) and isinstance(entry.get('sha256'), str)
+                and isinstance(entry.get('size'), int) and not isinstance(entry.get('size'), bool)):
+            raise ValueError(f"Invalid manifest entry for {name}")
+    return files
+
+
+def import_archive(stream, games_folder: str = GAMES_FOLDER, upload_folder: str = UPLOAD_FOLDER,
+                   overwrite: bool = False) -> dict:
+    """
+    Imports a tar archive produced by iter_export().
+
+    The archive is read as a stream and every entry is written to a staging folder while
+    its SHA-256 is computed. Only if all entries match MANIFEST.json are the files moved
+    into place (each with an atomic rename), so a corrupt or truncated upload changes nothing.
+
+    Args:
+        stream: Readable binary stream with the tar archive
+        games_folder: Folder holding the saved games
+        upload_folder: Folder holding uploaded images
+        overwrite: Replace existing files (by default they are kept)
+
+    Returns:
+        A dictionary with 'imported' and 'skipped' lists of archive entry names
+
+    Raises:
+        ValueError: If the archive is invalid or fails verification
+    """
+    staging_dir = os.path.join(games_folder, f".import-{uuid.uuid4().hex}")
+    os.makedirs(staging_dir)
+    staged = {}
+    manifest = None
+    total = 0
+
+    try:
+        try:
+            archive = tarfile.open(fileobj=stream, mode='r|*')
+        except tarfile.TarError as e:
+            raise ValueError(f"Not a valid archive: {e}")
+
+        with archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                total += member.size
+                if total > MAX_IMPORT_BYTES:
+                    raise ValueError('Archive is too large')
+
+                source = archive.extractfile(member)
+                if member.name == MANIFEST_NAME:
+                    if member.size > MAX_MANIFEST_BYTES:
+                        raise ValueError('Manifest is too large')
+                    manifest = parse_manifest(source.read())
+                    continue
+
+                destination = _destination(member.name, games_folder, upload_folder)
+                if destination is None:
+                    raise ValueError(f"Unexpected entry in archive: {member.name}")
+
+                staged_path = os.path.join(staging_dir, f"{len(staged)}.part")
+                digest = hashlib.sha256()
+                with open(staged_path, 'wb') as f:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        f.write(chunk)
+                staged[member.name] = (staged_path, destination, digest.hexdigest(), member.size)
+
+        if manifest is None:
+            raise ValueError('Archive has no MANIFEST.json')
+        if set(manifest) != set(staged):
+            raise ValueError('Archive contents do not match its manifest')
+        for name, (_, _, sha256, size) in staged.items():
+            if manifest[name].get('sha256') != sha256 or manifest[name].get('size') != size:
+                raise ValueError(f"Checksum mismatch for {name}")
+
+        imported = []
+        skipped = []
+        for name, (staged_path, destination, _, _) in staged.items():
+            if os.path.exists(destination) and not overwrite:
+                skipped.append(name)
+                continue
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            try:
+                os.replace(staged_path, destination)
+            except OSError:
+                # Staging folder on another filesystem: fall back to copying
+                shutil.move(staged_path, destination)
+            imported.append(name)
+
+        return {'imported': imported, 'skipped': skipped}
+    except tarfile.TarError as e:
+        raise ValueError(f"Corrupt archive: {e}")
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
@@ -0,0 +1,404 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from collections import Counter, OrderedDict
+
+# --- Configuration ---
+GAMES_FOLDER = 'games'
+DIFF_CACHE_DIR = os.path.join(GAMES_FOLDER, '.diff_cache')
+
+CONTEXT_LINES = 3
+# Above this many edits the two versions are treated as rewritten (one replace block).
+# The search keeps one copy of its frontier per round, so time and memory grow with
+# MAX_EDIT_DISTANCE squared; 500 keeps the worst case to a fraction of a second.
+MAX_EDIT_DISTANCE = 500
+# Comparisons the search may spend before giving up the same way (bounds the snake scans)
+MAX_DIFF_WORK = 300000
+MEMORY_CACHE_SIZE = 128
+# Diff files kept in DIFF_CACHE_DIR; past this the least recently used are evicted, down
+# to DISK_CACHE_PRUNE_TO so a burst of saves doesn't rescan the folder on every write
+MAX_DISK_CACHE_FILES = 2000
+DISK_CACHE_PRUNE_TO = 1800
+
+_memory_cache = OrderedDict()
+_file_hashes = {}
+_cache_lock = threading.Lock()
+_disk_cache_count = None
+
+# Precomputes run on a single background worker; only the newest saved version of each
+# game is kept pending, so an autosave burst costs one diff instead of one per save
+_job_queue = queue.Queue()
+_pending = {}
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def file_content_hash(file_path: str) -> str:
+    """Returns the SHA-256 of a file, memoized by path, size and modification time."""
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        if key in _file_hashes:
+            return _file_hashes[key]
+
+    with open(file_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    with _cache_lock:
+        if len(_file_hashes) > 4096:
+            _file_hashes.clear()
+        _file_hashes[key] = digest
+    return digest
+
+
+def myers_opcodes(a: list, b: list) -> list:
+    """
+    Computes the edit script between two sequences with Myers' O((N + M) * D) algorithm.
+
+    Common prefix and suffix are trimmed first, so typical edits to large files cost
+    little more than one linear scan.
+
+    Returns:
+        A list of (tag, i1, i2, j1, j2) opcodes like difflib's get_opcodes(), with tags
+        'equal', 'replace', 'delete' and 'insert'
+    """
+    n, m = len(a), len(b)
+    prefix = 0
+    while prefix < n and prefix < m and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and a[n - 1 - suffix] == b[m - 1 - suffix]:
+        suffix += 1
+
+    middle_a = a[prefix:n - suffix]
+    middle_b = b[prefix:m - suffix]
+    moves = _myers_moves(middle_a, middle_b)
+
+    opcodes = []
+    if prefix:
+        opcodes.append(('equal', 0, prefix, 0, prefix))
+
+    if moves is None:
+        # Too different to be worth an exact diff: report the middle as rewritten
+        tag = 'replace' if middle_a and middle_b else ('delete' if middle_a else 'insert')
+        if middle_a or middle_b:
+            opcodes.append((tag, prefix, n - suffix, prefix, m - suffix))
+    else:
+        i = j = prefix
+        block_i, block_j = i, j
+        for move in moves + ['equal-end']:
+            if move in ('equal', 'equal-end'):
+                if (i, j) != (block_i, block_j):
+                    if i > block_i and j > block_j:
+                        tag = 'replace'
+                    else:
+                        tag = 'delete' if i > block_i else 'insert'
+                    opcodes.append((tag, block_i, i, block_j, j))
+                if move == 'equal':
+                    if opcodes and opcodes[-1][0] == 'equal':
+                        _, i1, _, j1, _ = opcodes.pop()
+                        opcodes.append(('equal', i1, i + 1, j1, j + 1))
+                    else:
+                        opcodes.append(('equal', i, i + 1, j, j + 1))
+                    i += 1
+                    j += 1
+                block_i, block_j = i, j
+            elif move == 'delete':
+                i += 1
+            else:
+                j += 1
+
+    if suffix:
+        if opcodes and opcodes[-1][0] == 'equal':
+            _, i1, _, j1, _ = opcodes.pop()
+            opcodes.append(('equal', i1, n, j1, m))
+        else:
+            opcodes.append(('equal', n - suffix, n, m - suffix, m))
+
+    return opcodes
+
+
+def edit_distance_lower_bound(a: list, b: list) -> int:
+    """Lines of one side with no counterpart on the other; each needs at least one edit."""
+    count_a = Counter(a)
+    count_b = Counter(b)
+    return sum((count_a - count_b).values()) + sum((count_b - count_a).values())
+
+
+def _myers_moves(a: list, b: list):
+    """Returns the shortest edit path as a list of 'equal'/'delete'/'insert' moves, or None."""
+    n, m = len(a), len(b)
+    max_d = min(n + m, MAX_EDIT_DISTANCE)
+    # Linear check first: rewrites are rejected before any trace is stored
+    if edit_distance_lower_bound(a, b) > max_d:
+        return None
+    v = {1: 0}
+    trace = []
+    work = 0
+
+    for d in range(max_d + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            start = x
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            work += 1 + x - start
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+        if work > MAX_DIFF_WORK:
+            return None
+    return None
+
+
+def _backtrack(trace: list, x: int, y: int) -> list:
+    moves = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            moves.append('equal')
+            x -= 1
+            y -= 1
+        if d > 0:
+            moves.append('insert' if x == prev_x else 'delete')
+        x, y = prev_x, prev_y
+    moves.reverse()
+    return moves
+
+
+def group_hunks(opcodes: list, context: int = CONTEXT_LINES) -> list:
+    """Groups opcodes into hunks with `context` unchanged lines around each change."""
+    codes = list(opcodes)
+    if not codes or all(code[0] == 'equal' for code in codes):
+        return []
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    hunks = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            hunks.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        hunks.append(group)
+    return hunks
+
+
+def compute_diff(old_text: str, new_text: str) -> dict:
+    """
+    Computes a compact line diff between two documents.
+
+    Returns:
+        A dictionary with 'added', 'removed' and 'hunks'; each hunk has 1-based
+        'from_start'/'from_count'/'to_start'/'to_count' and 'lines' prefixed with
+        ' ', '-' or '+' like a unified diff
+    """
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+
+    # Compare small ints instead of (possibly very long) strings
+    line_ids = {}
+    a = [line_ids.setdefault(line, len(line_ids)) for line in old_lines]
+    b = [line_ids.setdefault(line, len(line_ids)) for line in new_lines]
+    opcodes = myers_opcodes(a, b)
+
+    added = removed = 0
+    hunks = []
+    for group in group_hunks(opcodes):
+        lines = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                lines.extend(' ' + line for line in old_lines[i1:i2])
+                continue
+            lines.extend('-' + line for line in old_lines[i1:i2])
+            lines.extend('+' + line for line in new_lines[j1:j2])
+            removed += i2 - i1
+            added += j2 - j1
+        from_start, from_end = group[0][1], group[-1][2]
+        to_start, to_end = group[0][3], group[-1][4]
+        hunks.append({
+            'from_start': from_start + 1,
+            'from_count': from_end - from_start,
+            'to_start': to_start + 1,
+            'to_count': to_end - to_start,
+            'lines': lines,
+        })
+
+    return {'added': added, 'removed': removed, 'hunks': hunks}
+
+
+def format_unified(diff: dict, from_name: str, to_name: str) -> str:
+    """Renders a diff computed by compute_diff() as unified diff text."""
+    output = [f'--- {from_name}', f'+++ {to_name}']
+    for hunk in diff['hunks']:
+        output.append(f"@@ -{hunk['from_start']},{hunk['from_count']} "
+                      f"+{hunk['to_start']},{hunk['to_count']} @@")
+        output.extend(hunk['lines'])
+    return '\n'.join(output) + '\n'
+
+
+def get_diff(from_path: str, to_path: str) -> dict:
+    """
+    Returns the diff between two saved game files, cached by their content-hash pair
+    (in memory and in games/.diff_cache/).
+
+    Returns:
+        The compute_diff() result plus 'from_hash' and 'to_hash'
+    """
+    from_hash = file_content_hash(from_path)
+    to_hash = file_content_hash(to_path)
+    key = f"{from_hash}_{to_hash}"
+
+    with _cache_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+
+    cache_path = os.path.join(DIFF_CACHE_DIR, f"{key}.json")
+    diff = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                diff = json.load(f)
+            # Eviction goes by modification time: mark the entry as recently used
+            os.utime(cache_path)
+        except (OSError, ValueError):
+            diff = None
+
+    if diff is None:
+        with open(from_path, 'r', encoding='utf-8', errors='replace') as f:
+            old_text = f.read()
+        with open(to_path, 'r', encoding='utf-8', errors='replace') as f:
+            new_text = f.read()
+        diff = compute_diff(old_text, new_text)
+        diff['from_hash'] = from_hash
+        diff['to_hash'] = to_hash
+
+        os.makedirs(DIFF_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(diff, f)
+        os.replace(tmp_path, cache_path)
+        _count_disk_cache_write()
+
+    with _cache_lock:
+        _memory_cache[key] = diff
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+    return diff
+
+
+def _count_disk_cache_write():
+    """Counts a new file in DIFF_CACHE_DIR and prunes the folder once it passes the cap."""
+    global _disk_cache_count
+    with _cache_lock:
+        if _disk_cache_count is None:
+            _disk_cache_count = len(os.listdir(DIFF_CACHE_DIR))
+        else:
+            _disk_cache_count += 1
+        if _disk_cache_count > MAX_DISK_CACHE_FILES:
+            _disk_cache_count = prune_disk_cache(DISK_CACHE_PRUNE_TO)
+
+
+def prune_disk_cache(keep: int = DISK_CACHE_PRUNE_TO) -> int:
+    """
+    Deletes the least recently used diff files in DIFF_CACHE_DIR, keeping `keep` of them.
+
+    Returns:
+        The number of files left in the folder
+    """
+    entries = []
+    try:
+        with os.scandir(DIFF_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+    except FileNotFoundError:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _, path in entries[:max(0, len(entries) - keep)]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"Pruned {removed} cached diffs")
+    return len(entries) - removed
+
+
+def previous_version(game_dir: str, version: str):
+    """Returns the version saved just before `version` (versions sort by timestamp name)."""
+    older = [f for f in os.listdir(game_dir) if f.endswith('.html') and f < version]
+    return max(older) if older else None
+
+
+def _precompute(game_dir: str, version: str):
+    try:
+        if not os.path.exists(os.path.join(game_dir, version)):
+            return
+        previous = previous_version(game_dir, version)
+        if previous:
+            get_diff(os.path.join(game_dir, previous), os.path.join(game_dir, version))
+    except Exception as e:
+        print(f"🚨 ERROR: Diff precompute failed for {game_dir}/{version}: {e}")
+
+
+def _worker_loop():
+    while True:
+        game_dir = _job_queue.get()
+        try:
+            with _pending_lock:
+                version = _pending.pop(game_dir, None)
+            if version:
+                _precompute(game_dir, version)
+        finally:
+            _job_queue.task_done()
+
+
+def precompute_previous_diff(game_dir: str, version: str):
+    """
+    Queues the diff against the previous version on the background worker.
+
+    If the game already has a pending precompute, it is replaced by this (newer) version.
+    """
+    global _worker
+
+    with _pending_lock:
+        already_queued = game_dir in _pending
+        _pending[game_dir] = max(version, _pending.get(game_dir, version))
+
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop)
+            _worker.daemon = True
+            _worker.start()
+
+    if not already_queued:
+        _job_queue.put(game_dir)
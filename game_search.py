@@ -0,0 +1,283 @@
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from html.parser import HTMLParser
+
+# --- Configuration ---
+GAMES_FOLDER = 'games'
+INDEX_PATH = os.path.join(GAMES_FOLDER, 'search_index.sqlite3')
+
+# bm25 column weights: game_id, version, title, text, script
+COLUMN_WEIGHTS = (5.0, 5.0, 4.0, 2.0, 1.0)
+SNIPPET_TOKENS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    game_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    timestamp TEXT,
+    UNIQUE (game_id, version)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS versions_fts USING fts5(
+    game_id, version, title, text, script,
+    tokenize = 'porter unicode61'
+);
+"""
+
+# Index updates run on a single background worker, in the order they were queued,
+# so saving a game never waits for the HTML to be parsed
+_job_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class GameTextExtractor(HTMLParser):
+    """Splits a game's HTML into its title, visible text and script/style content."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.text = []
+        self.script = []
+        self._current_tag = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style', 'title'):
+            self._current_tag = tag
+
+    def handle_endtag(self, tag):
+        if tag == self._current_tag:
+            self._current_tag = None
+
+    def handle_data(self, data):
+        if not data.strip():
+            return
+        if self._current_tag == 'title':
+            self.title.append(data.strip())
+        elif self._current_tag in ('script', 'style'):
+            self.script.append(data)
+        else:
+            self.text.append(data.strip())
+
+
+def extract_game_text(html: str) -> dict:
+    """
+    Extracts the searchable content of a game's HTML.
+
+    Returns:
+        A dictionary with 'title', 'text' and 'script' strings
+    """
+    extractor = GameTextExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception as e:
+        print(f"HTML parsing stopped early: {e}")
+    return {
+        'title': ' '.join(extractor.title),
+        'text': ' '.join(extractor.text),
+        'script': '\n'.join(extractor.script),
+    }
+
+
+def connect(index_path: str = INDEX_PATH) -> sqlite3.Connection:
+    """Opens the search index, creating the tables on first use."""
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    connection = sqlite3.connect(index_path, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def index_game_version(game_id: str, version: str, file_path: str, index_path: str = INDEX_PATH):
+    """
+    Adds or replaces one saved game version in the search index.
+
+    Args:
+        game_id: The (sanitized) game ID, i.e. the folder name under games/
+        version: The version filename (e.g. 2025-11-21T00-15-29-299Z.html)
+        file_path: Path to the saved HTML file
+        index_path: Path to the SQLite index
+    """
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        content = extract_game_text(f.read())
+    timestamp = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+
+    connection = connect(index_path)
+    try:
+        with connection:
+            row = connection.execute(
+                'SELECT id FROM versions WHERE game_id = ? AND version = ?', (game_id, version)
+            ).fetchone()
+            if row:
+                connection.execute('DELETE FROM versions_fts WHERE rowid = ?', (row[0],))
+                connection.execute('UPDATE versions SET timestamp = ? WHERE id = ?', (timestamp, row[0]))
+                row_id = row[0]
+            else:
+                row_id = connection.execute(
+                    'INSERT INTO versions (game_id, version, timestamp) VALUES (?, ?, ?)',
+                    (game_id, version, timestamp)
+                ).lastrowid
+            connection.execute(
+                'INSERT INTO versions_fts (rowid, game_id, version, title, text, script) VALUES (?, ?, ?, ?, ?, ?)',
+                (row_id, game_id, version, content['title'], content['text'], content['script'])
+            )
+    finally:
+        connection.close()
+
+
+def remove_game_version(game_id: str, version: str, index_path: str = INDEX_PATH):
+    """Removes one game version from the search index (no-op if it isn't indexed)."""
+    connection = connect(index_path)
+    try:
+        with connection:
+            row = connection.execute(
+                'SELECT id FROM versions WHERE game_id = ? AND version = ?', (game_id, version)
+            ).fetchone()
+            if row:
+                connection.execute('DELETE FROM versions_fts WHERE rowid = ?', (row[0],))
+                connection.execute('DELETE FROM versions WHERE id = ?', (row[0],))
+    finally:
+        connection.close()
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turns free text into an FTS5 MATCH expression: every word must match, the last
+    one as a prefix (so results update while typing). Words are quoted, so FTS5
+    operators in the user input are treated as plain text.
+    """
+    terms = [term.replace('"', '""') for term in query.split()]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_games(query: str, limit: int = 20, game_id: str = None, index_path: str = INDEX_PATH) -> list:
+    """
+    Full-text search over all indexed game versions, ranked by bm25.
+
+    Args:
+        query: Free-text search query
+        limit: Maximum number of hits
+        game_id: Optionally restrict the search to one game
+        index_path: Path to the SQLite index
+
+    Returns:
+        A list of hits with 'game_id', 'version', 'timestamp', 'snippet' and 'score'
+    """
+    match_query = build_match_query(query)
+    if not match_query:
+        return []
+
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    sql = (
+        f"SELECT v.game_id, v.version, v.timestamp, "
+        f"snippet(versions_fts, -1, '[', ']', '…', {SNIPPET_TOKENS}), "
+        f"bm25(versions_fts, {weights}) AS score "
+        f"FROM versions_fts JOIN versions v ON v.id = versions_fts.rowid "
+        f"WHERE versions_fts MATCH ?"
+    )
+    params = [match_query]
+    if game_id:
+        sql += " AND v.game_id = ?"
+        params.append(game_id)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    connection = connect(index_path)
+    try:
+        rows = connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+
+    return [
+        {
+            'game_id': row[0],
+            'version': row[1],
+            'timestamp': row[2],
+            'snippet': row[3],
+            'score': round(-row[4], 6),  # bm25() is lower-is-better; expose higher-is-better
+        }
+        for row in rows
+    ]
+
+
+def rebuild_index(games_folder: str = GAMES_FOLDER, index_path: str = INDEX_PATH) -> int:
+    """
+    Rebuilds the search index from scratch from an existing games/ tree.
+
+    Returns:
+        The number of indexed game versions
+    """
+    if os.path.exists(index_path):
+        os.remove(index_path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(index_path + suffix):
+                os.remove(index_path + suffix)
+
+    count = 0
+    for game_id in sorted(os.listdir(games_folder)):
+        game_dir = os.path.join(games_folder, game_id)
+        if game_id.startswith('.') or not os.path.isdir(game_dir):
+            continue
+        for version in sorted(os.listdir(game_dir)):
+            if version.endswith('.html'):
+                index_game_version(game_id, version, os.path.join(game_dir, version), index_path)
+                count += 1
+    return count
+
+
+def _worker_loop():
+    while True:
+        action, args = _job_queue.get()
+        try:
+            action(*args)
+        except Exception as e:
+            print(f"🚨 ERROR: Search index update failed ({action.__name__} {args[:2]}): {e}")
+        finally:
+            _job_queue.task_done()
+
+
+def _enqueue(action, *args):
+    global _worker
+
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop)
+            _worker.daemon = True
+            _worker.start()
+    _job_queue.put((action, args))
+
+
+def queue_index(game_id: str, version: str, file_path: str):
+    """Queues (re)indexing of a saved game version on the background worker."""
+    _enqueue(index_game_version, game_id, version, file_path)
+
+
+def queue_remove(game_id: str, version: str):
+    """Queues removal of a deleted game version from the index on the background worker."""
+    _enqueue(remove_game_version, game_id, version)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'search'):
+        print("Usage:")
+        print(f"  python {sys.argv[0]} rebuild [GAMES_DIR]   Rebuild the index from an existing games/ tree")
+        print(f"  python {sys.argv[0]} search <QUERY>        Search the index")
+        sys.exit(1)
+
+    if sys.argv[1] == 'rebuild':
+        folder = sys.argv[2] if len(sys.argv) > 2 else GAMES_FOLDER
+        total = rebuild_index(folder, os.path.join(folder, os.path.basename(INDEX_PATH)))
+        print(f"✅ Indexed {total} game versions")
+    else:
+        for hit in search_games(' '.join(sys.argv[2:])):
+            print(f"{hit['score']:8.3f}  {hit['game_id']}/{hit['version']}  {hit['snippet']}")
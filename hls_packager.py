@@ -0,0 +1,297 @@
+import json
+import math
+import os
+import subprocess
+import threading
+
+# --- Configuration ---
+FFMPEG_PATH = 'ffmpeg'    # Assumes 'ffmpeg' is in your system's PATH.
+FFPROBE_PATH = 'ffprobe'  # Assumes 'ffprobe' is in your system's PATH.
+
+TARGET_SEGMENT_SECONDS = 6
+LOW_RENDITION_HEIGHT = 480
+LOW_RENDITION_BANDWIDTH = 1000000  # Advertised bits/s of the low rendition (video + audio)
+
+# One lock per segment being produced, so concurrent requests for the same
+# segment run FFmpeg once and everyone else waits for the cached file
+_segment_locks = {}
+_locks_guard = threading.Lock()
+_low_rendition_jobs = set()
+
+
+def get_cache_dir(filepath: str) -> str:
+    """Returns the directory holding the HLS cache for a downloaded file (next to the file)."""
+    return f"{filepath}.hls"
+
+
+def _get_lock(key: str) -> threading.Lock:
+    with _locks_guard:
+        if key not in _segment_locks:
+            _segment_locks[key] = threading.Lock()
+        return _segment_locks[key]
+
+
+def probe_media(filepath: str) -> dict:
+    """
+    Reads the duration and the video keyframe timestamps of a media file with ffprobe.
+
+    Only packet headers are read (no decoding), so this is fast even for large files.
+
+    Args:
+        filepath: Path to the media file
+
+    Returns:
+        A dictionary with 'duration' (float), 'has_video' (bool) and 'keyframes' (list of floats)
+    """
+    duration_output = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', filepath],
+        check=True, capture_output=True, text=True
+    ).stdout.strip()
+    duration = float(duration_output or 0)
+
+    packets_output = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', filepath],
+        check=True, capture_output=True, text=True
+    ).stdout
+
+    keyframes = []
+    for line in packets_output.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            keyframes.append(float(parts[0]))
+    keyframes.sort()
+
+    return {
+        'duration': duration,
+        'has_video': bool(packets_output.strip()),
+        'keyframes': keyframes,
+    }
+
+
+def build_segments(duration: float, keyframes: list, target: float = TARGET_SEGMENT_SECONDS) -> list:
+    """
+    Splits a file into segments of at least `target` seconds that start on keyframes.
+
+    Stream copy can only cut on keyframes, so boundaries are snapped to them. Audio-only
+    files (no keyframe list) are split at fixed intervals.
+
+    Args:
+        duration: Total duration in seconds
+        keyframes: Sorted keyframe timestamps (empty for audio-only files)
+        target: Minimum segment duration in seconds
+
+    Returns:
+        A list of [start, duration] pairs
+    """
+    if keyframes:
+        candidates = keyframes
+    else:
+        candidates = [i * target for i in range(int(duration // target) + 1)]
+
+    boundaries = [0.0]
+    for timestamp in candidates:
+        if timestamp - boundaries[-1] >= target and duration - timestamp > 0.5:
+            boundaries.append(timestamp)
+    boundaries.append(duration)
+
+    return [[start, end - start] for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def load_manifest(filepath: str) -> dict:
+    """
+    Returns the segment manifest for a file, probing it once and caching the result on disk.
+
+    The cache is invalidated when the file size or modification time changes.
+
+    Args:
+        filepath: Path to the downloaded media file
+
+    Returns:
+        A dictionary with 'duration', 'has_video', 'size' and 'segments'
+    """
+    cache_dir = get_cache_dir(filepath)
+    manifest_path = os.path.join(cache_dir, 'segments.json')
+    stat = os.stat(filepath)
+
+    with _get_lock(manifest_path):
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('size') == stat.st_size and manifest.get('mtime') == stat.st_mtime:
+                return manifest
+
+        info = probe_media(filepath)
+        manifest = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'duration': info['duration'],
+            'has_video': info['has_video'],
+            'segments': build_segments(info['duration'], info['keyframes']),
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+        return manifest
+
+
+def build_master_playlist(filepath: str) -> str:
+    """
+    Builds the HLS master playlist: the original-quality rendition plus the low-bitrate
+    rendition once it has finished generating in the background.
+    """
+    manifest = load_manifest(filepath)
+    duration = manifest['duration'] or 1
+    source_bandwidth = int(manifest['size'] * 8 / duration)
+
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    if is_low_rendition_ready(filepath):
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={LOW_RENDITION_BANDWIDTH}')
+        lines.append('low/index.m3u8')
+    lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={source_bandwidth}')
+    lines.append('source.m3u8')
+    return '\n'.join(lines) + '\n'
+
+
+def build_media_playlist(filepath: str) -> str:
+    """Builds the VOD media playlist for the original-quality (stream copy) rendition."""
+    manifest = load_manifest(filepath)
+    segments = manifest['segments']
+    target_duration = math.ceil(max((d for _, d in segments), default=TARGET_SEGMENT_SECONDS))
+
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{target_duration}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+    ]
+    for index, (_, segment_duration) in enumerate(segments):
+        lines.append(f'#EXTINF:{segment_duration:.3f},')
+        lines.append(f'source/{index}.ts')
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def get_segment(filepath: str, index: int) -> str:
+    """
+    Returns the path of a cached MPEG-TS segment, cutting it with stream copy on first request.
+
+    Args:
+        filepath: Path to the downloaded media file
+        index: Segment number from the media playlist
+
+    Returns:
+        The path to the segment file, or None if the index is out of range
+    """
+    manifest = load_manifest(filepath)
+    if index < 0 or index >= len(manifest['segments']):
+        return None
+
+    segment_dir = os.path.join(get_cache_dir(filepath), 'source')
+    segment_path = os.path.join(segment_dir, f'{index}.ts')
+    if os.path.exists(segment_path):
+        return segment_path
+
+    with _get_lock(segment_path):
+        # Another request may have produced it while we were waiting
+        if os.path.exists(segment_path):
+            return segment_path
+
+        os.makedirs(segment_dir, exist_ok=True)
+        start, segment_duration = manifest['segments'][index]
+        # Round the keyframe time up: a seek to just before it would start at the previous
+        # keyframe and repeat a whole GOP that overlaps the previous segment
+        start = math.ceil(start * 1000) / 1000
+        tmp_path = f"{segment_path}.tmp"
+
+        # -ss/-t before -i: seek straight to the keyframe and read only this segment
+        # -copyts: keep the original timestamps so independently cut segments line up
+        ffmpeg_command = [
+            FFMPEG_PATH, '-v', 'error', '-y',
+            '-ss', f'{start:.3f}',
+            '-t', f'{segment_duration:.3f}',
+            '-i', filepath,
+            '-map', '0:v:0?', '-map', '0:a:0?',
+            '-c', 'copy',
+            '-copyts',
+            '-muxdelay', '0',
+            '-f', 'mpegts',
+            tmp_path
+        ]
+        subprocess.run(ffmpeg_command, check=True, capture_output=True)
+        os.replace(tmp_path, segment_path)
+
+    return segment_path
+
+
+def is_low_rendition_ready(filepath: str) -> bool:
+    """Checks whether the background low-bitrate rendition has been completely written."""
+    return os.path.exists(os.path.join(get_cache_dir(filepath), 'low', '.done'))
+
+
+def is_low_rendition_failed(filepath: str) -> bool:
+    """Checks whether generating the low-bitrate rendition failed (it is not retried)."""
+    return os.path.exists(os.path.join(get_cache_dir(filepath), 'low', '.failed'))
+
+
+def get_low_rendition_dir(filepath: str) -> str:
+    """Returns the directory holding the low-bitrate rendition playlist and segments."""
+    return os.path.join(get_cache_dir(filepath), 'low')
+
+
+def _generate_low_rendition(filepath: str):
+    low_dir = get_low_rendition_dir(filepath)
+    os.makedirs(low_dir, exist_ok=True)
+
+    ffmpeg_command = [
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-i', filepath,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f'scale=-2:{LOW_RENDITION_HEIGHT}',
+        '-c:v', 'libx264', '-preset', 'veryfast',
+        '-b:v', '800k', '-maxrate', '900k', '-bufsize', '1600k',
+        '-c:a', 'aac', '-b:a', '96k',
+        '-f', 'hls',
+        '-hls_time', str(TARGET_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(low_dir, '%d.ts'),
+        os.path.join(low_dir, 'index.m3u8')
+    ]
+
+    try:
+        print(f"Generating low-bitrate rendition for {filepath}")
+        subprocess.run(ffmpeg_command, check=True, capture_output=True)
+        open(os.path.join(low_dir, '.done'), 'w').close()
+        print(f"Low-bitrate rendition ready for {filepath}")
+    except Exception as e:
+        print(f"🚨 ERROR: Low-bitrate rendition failed for {filepath}: {e}")
+        # e.g. FFmpeg without libx264: don't start another full transcode on every request
+        open(os.path.join(low_dir, '.failed'), 'w').close()
+    finally:
+        with _locks_guard:
+            _low_rendition_jobs.discard(filepath)
+
+
+def start_low_rendition(filepath: str):
+    """
+    Starts generating the low-bitrate rendition in a background thread (once per file).
+
+    Audio-only files are skipped since they are already small, and so are files whose
+    rendition already failed once.
+    """
+    if is_low_rendition_ready(filepath) or is_low_rendition_failed(filepath):
+        return
+    if not load_manifest(filepath)['has_video']:
+        return
+
+    with _locks_guard:
+        if filepath in _low_rendition_jobs:
+            return
+        _low_rendition_jobs.add(filepath)
+
+    thread = threading.Thread(target=_generate_low_rendition, args=(filepath,))
+    thread.daemon = True
+    thread.start()
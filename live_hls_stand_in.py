@@ -0,0 +1,158 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from m3u8_converter import FFMPEG_PATH
+
+# --- Configuration ---
+SEGMENT_SECONDS = 2
+SOURCE_SEGMENTS = 5
+PLAYLIST_WINDOW = 6
+
+
+def generate_segments(folder: str, count: int) -> list:
+    """
+    Encodes `count` MPEG-TS test segments (color bars + tone) with FFmpeg.
+
+    Without FFmpeg, segments are filler bytes: enough to exercise the playlist polling,
+    but the recorder's own FFmpeg will reject them.
+    """
+    if shutil.which(FFMPEG_PATH) is None:
+        print("FFmpeg not found, serving filler segments", file=sys.stderr)
+        return [bytes([index]) * 188 * 100 for index in range(count)]
+
+    subprocess.run([
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=25:duration={count * SEGMENT_SECONDS}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={count * SEGMENT_SECONDS}',
+        '-c:v', 'libx264', '-g', str(25 * SEGMENT_SECONDS), '-c:a', 'aac',
+        '-f', 'segment', '-segment_time', str(SEGMENT_SECONDS), '-segment_format', 'mpegts',
+        os.path.join(folder, 'source%d.ts')
+    ], stdin=subprocess.DEVNULL, check=True)
+    segments = []
+    for index in range(count):
+        with open(os.path.join(folder, f'source{index}.ts'), 'rb') as f:
+            segments.append(f.read())
+    return segments
+
+
+class LivePlaylistHandler(BaseHTTPRequestHandler):
+    """
+    Serves /live.m3u8 as a rolling live playlist (one new segment every SEGMENT_SECONDS)
+    and /seg<sequence>.ts, cycling through the generated segments.
+    """
+
+    def current_sequence(self) -> int:
+        return int((time.monotonic() - self.server.started) / self.server.segment_seconds) + PLAYLIST_WINDOW
+
+    def do_GET(self):
+        if self.path == '/live.m3u8':
+            last = self.current_sequence()
+            ended = self.server.end_after is not None and last >= self.server.end_after
+            if ended:
+                last = self.server.end_after
+            first = max(0, last - PLAYLIST_WINDOW + 1)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3',
+                     f'#EXT-X-TARGETDURATION:{self.server.segment_seconds}',
+                     f'#EXT-X-MEDIA-SEQUENCE:{first}']
+            for sequence in range(first, last + 1):
+                lines += [f'#EXTINF:{self.server.segment_seconds:.3f},', f'seg{sequence}.ts']
+            if ended:
+                lines.append('#EXT-X-ENDLIST')
+            self.reply(200, 'application/vnd.apple.mpegurl', ('\n'.join(lines) + '\n').encode('utf-8'))
+            return
+
+        name = self.path.lstrip('/')
+        if name.startswith('seg') and name.endswith('.ts') and name[3:-3].isdigit():
+            sequence = int(name[3:-3])
+            if sequence not in self.server.missing and sequence <= self.current_sequence():
+                self.reply(200, 'video/mp2t', self.server.segments[sequence % len(self.server.segments)])
+                return
+        self.send_error(404)
+
+    def reply(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in(segments: list, port: int = 0, missing=(), end_after: int = None,
+                   segment_seconds: int = SEGMENT_SECONDS) -> ThreadingHTTPServer:
+    """Starts the rolling-playlist server in a background thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), LivePlaylistHandler)
+    server.daemon_threads = True
+    server.segments = segments
+    server.missing = set(missing)
+    server.end_after = end_after
+    server.segment_seconds = segment_seconds
+    server.started = time.monotonic()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def run_check(segments: list, folder: str) -> bool:
+    """
+    Records from the stand-in with one missing segment and a stop mid-stream, and checks
+    the recording survives both: the gap is skipped and the partial file is kept.
+    """
+    from live_recorder import record_live_hls
+
+    # The recorder starts LIVE_EDGE_SEGMENTS behind the edge; make one of the next ones fail
+    server = start_stand_in(segments, missing={PLAYLIST_WINDOW + 1}, segment_seconds=1)
+    url = f"http://127.0.0.1:{server.server_address[1]}/live.m3u8"
+    output = os.path.join(folder, 'check.mp4')
+    stop = threading.Event()
+    threading.Timer(6, stop.set).start()
+    try:
+        stats = record_live_hls(url, output, stop_event=stop)
+    finally:
+        server.shutdown()
+
+    passed = (stats['reason'] == 'stopped' and stats['skipped_segments'] == 1 and stats['segments'] > 0
+              and os.path.exists(output) and os.path.getsize(output) > 0)
+    print(f"{'✅ Check passed' if passed else '🚨 Check failed'}: {stats}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local rolling live HLS playlist for testing the live recorder.")
+    parser.add_argument('--port', type=int, default=8090, help="Port to listen on (default: 8090)")
+    parser.add_argument('--missing', type=int, action='append', default=[],
+                        help="Media sequence number that answers 404 (repeatable)")
+    parser.add_argument('--end-after', type=int, help="Add #EXT-X-ENDLIST once this sequence is reached")
+    parser.add_argument('--check', action='store_true',
+                        help="Record from the stand-in with a missing segment and a stop, then exit")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='live_hls_')
+    try:
+        segments = generate_segments(folder, SOURCE_SEGMENTS)
+        if args.check:
+            sys.exit(0 if run_check(segments, folder) else 1)
+
+        server = start_stand_in(segments, args.port, args.missing, args.end_after)
+        print(f"Live playlist: http://127.0.0.1:{server.server_address[1]}/live.m3u8 (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
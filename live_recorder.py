@@ -0,0 +1,401 @@
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from urllib.parse import urljoin
+
+from m3u8_converter import FFMPEG_PATH, parse_m3u8_attributes, select_audio_playlist
+
+# Number of segments behind the live edge to start from (the HLS spec advises
+# clients not to start closer than three target durations to the end)
+LIVE_EDGE_SEGMENTS = 3
+# Consecutive playlist fetch failures tolerated before giving up
+MAX_PLAYLIST_ERRORS = 5
+# Consecutive segment (or init segment) fetch failures tolerated before giving up;
+# a failed segment is skipped, leaving a short gap in the recording
+MAX_SEGMENT_ERRORS = 5
+REQUEST_TIMEOUT = 15
+
+
+def fetch_text(url: str) -> str:
+    """Fetches a playlist and returns it as text."""
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+        return response.read().decode('utf-8', errors='replace')
+
+
+def fetch_bytes(url: str) -> bytes:
+    """Fetches a media segment and returns its raw bytes."""
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+        return response.read()
+
+
+def parse_media_playlist(playlist_url: str, playlist: str) -> dict:
+    """
+    Parses an HLS media playlist.
+
+    Args:
+        playlist_url: The URL the playlist was fetched from (to resolve relative URIs)
+        playlist: The playlist text
+
+    Returns:
+        A dictionary with 'target_duration' (float), 'ended' (bool), 'init_uri' (str or None)
+        and 'segments' (list of (sequence, duration, uri) tuples)
+    """
+    media_sequence = 0
+    target_duration = 6.0
+    ended = False
+    init_uri = None
+    segments = []
+    segment_duration = None
+
+    for line in (line.strip() for line in playlist.splitlines()):
+        if not line:
+            continue
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            media_sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            target_duration = float(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-ENDLIST') or line == '#EXT-X-PLAYLIST-TYPE:VOD':
+            ended = True
+        elif line.startswith('#EXT-X-MAP:'):
+            init_uri = urljoin(playlist_url, parse_m3u8_attributes(line)['URI'])
+        elif line.startswith('#EXT-X-KEY:'):
+            if parse_m3u8_attributes(line).get('METHOD', 'NONE') != 'NONE':
+                raise ValueError('Encrypted live streams are not supported')
+        elif line.startswith('#EXTINF:'):
+            segment_duration = float(line.split(':', 1)[1].split(',', 1)[0])
+        elif not line.startswith('#'):
+            sequence = media_sequence + len(segments)
+            segments.append((sequence, segment_duration or target_duration, urljoin(playlist_url, line)))
+            segment_duration = None
+
+    return {
+        'target_duration': target_duration,
+        'ended': ended,
+        'init_uri': init_uri,
+        'segments': segments,
+    }
+
+
+def resolve_renditions(m3u8_url: str) -> tuple:
+    """
+    Picks the highest-bandwidth variant of a master playlist.
+
+    Returns:
+        (media_playlist_url, audio_playlist_url): the audio URL is set when the variant's
+        AUDIO group is a separate rendition (its video playlist then carries no sound),
+        otherwise None. A media playlist URL is returned as is.
+    """
+    playlist = fetch_text(m3u8_url)
+    lines = [line.strip() for line in playlist.splitlines() if line.strip()]
+    variants = []
+    audio_groups = {}
+    for index, line in enumerate(lines):
+        if line.startswith('#EXT-X-STREAM-INF:') and index + 1 < len(lines):
+            attributes = parse_m3u8_attributes(line)
+            variants.append((int(attributes.get('BANDWIDTH', '0') or 0), lines[index + 1],
+                             attributes.get('AUDIO')))
+        elif line.startswith('#EXT-X-MEDIA:'):
+            attributes = parse_m3u8_attributes(line)
+            if attributes.get('TYPE') == 'AUDIO' and attributes.get('URI'):
+                group = audio_groups.setdefault(attributes.get('GROUP-ID'), [])
+                # The DEFAULT rendition of a group goes first
+                if attributes.get('DEFAULT') == 'YES':
+                    group.insert(0, attributes['URI'])
+                else:
+                    group.append(attributes['URI'])
+
+    if not variants:
+        return m3u8_url, None
+    _, variant_uri, audio_group = max(variants, key=lambda variant: variant[0])
+    audio_uris = audio_groups.get(audio_group)
+    audio_url = urljoin(m3u8_url, audio_uris[0]) if audio_uris else None
+    return urljoin(m3u8_url, variant_uri), audio_url
+
+
+def resolve_media_playlist(m3u8_url: str, audio_only: bool = False) -> str:
+    """
+    Returns the media playlist to record: the highest-bandwidth variant of a master
+    playlist (or its audio rendition in audio-only mode), or the URL itself.
+    """
+    if audio_only:
+        return select_audio_playlist(m3u8_url)
+    return resolve_renditions(m3u8_url)[0]
+
+
+def is_live_m3u8(m3u8_url: str) -> bool:
+    """
+    Checks whether an M3U8 URL is a live stream (its media playlist has no #EXT-X-ENDLIST).
+
+    Unreadable playlists are reported as not live, so they keep using the VOD path.
+    """
+    try:
+        media_url = resolve_media_playlist(m3u8_url)
+        return not parse_media_playlist(media_url, fetch_text(media_url))['ended']
+    except Exception as e:
+        print(f"Could not inspect playlist ({e}), treating it as VOD")
+        return False
+
+
+def record_live_hls(m3u8_url: str, output_filename: str, stop_event: threading.Event = None,
+                    max_duration: float = None, max_bytes: int = None,
+                    recording_callback=None, audio_only: bool = False) -> dict:
+    """
+    Records a live HLS stream by polling its media playlist and fetching new segments.
+
+    Segments are piped into FFmpeg, which remuxes them (stream copy) into a fragmented MP4,
+    so the output can be played while the recording grows. Recording ends when the stream
+    ends, a limit is reached, or stop_event is set; FFmpeg is then closed cleanly.
+    Variants whose audio is a separate rendition are recorded by FFmpeg itself
+    (see record_renditions_with_ffmpeg), since one piped input can only carry one playlist.
+
+    Args:
+        m3u8_url: The URL of the live M3U8 playlist (master or media)
+        output_filename: The name of the resulting MP4 (or M4A in audio-only mode) file
+        stop_event: Optional event that stops the recording when set
+        max_duration: Optional maximum recorded duration in seconds
+        max_bytes: Optional maximum number of fetched bytes
+        recording_callback: Optional callback(seconds, bytes) called after each segment
+        audio_only: Only record the audio rendition
+
+    Returns:
+        A dictionary with 'duration' (float), 'bytes' (int), 'segments' (int),
+        'skipped_segments' (int) and 'reason' (str)
+    """
+    print(f"\n--- Starting Live HLS Recording ---")
+    print(f"Source URL: {m3u8_url}")
+    print(f"Output File: {output_filename}")
+
+    stop_event = stop_event or threading.Event()
+    if audio_only:
+        media_url = select_audio_playlist(m3u8_url)
+    else:
+        media_url, audio_url = resolve_renditions(m3u8_url)
+        if audio_url:
+            # Sound lives in a separate rendition: let FFmpeg follow both playlists
+            print("Audio is a separate rendition, recording both playlists with FFmpeg")
+            return record_renditions_with_ffmpeg(media_url, audio_url, output_filename, stop_event,
+                                                 max_duration, max_bytes, recording_callback)
+
+    # frag_keyframe+empty_moov: write a playable fragment per keyframe instead of a
+    # single moov atom at the end, so the file is usable while it's being written
+    ffmpeg_command = [
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-i', 'pipe:0',
+        *(['-map', '0:a:0'] if audio_only else ['-map', '0:v?', '-map', '0:a?']),
+        # No explicit -bsf:a aac_adtstoasc: the mp4 muxer inserts it for AAC, and it would
+        # reject AC-3/MP3 renditions
+        '-c', 'copy',
+        '-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4',
+        output_filename
+    ]
+    process = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE)
+
+    recorded_duration = 0.0
+    recorded_bytes = 0
+    segment_count = 0
+    last_sequence = None
+    init_written = False
+    playlist_errors = 0
+    segment_errors = 0
+    skipped_segments = 0
+    reason = 'stopped'
+
+    try:
+        while not stop_event.is_set():
+            try:
+                playlist = parse_media_playlist(media_url, fetch_text(media_url))
+                playlist_errors = 0
+            except ValueError:
+                raise
+            except Exception as e:
+                playlist_errors += 1
+                print(f"Playlist fetch failed ({playlist_errors}/{MAX_PLAYLIST_ERRORS}): {e}")
+                if playlist_errors >= MAX_PLAYLIST_ERRORS:
+                    reason = 'playlist unavailable'
+                    break
+                stop_event.wait(2)
+                continue
+
+            segments = playlist['segments']
+            if last_sequence is None:
+                segments = segments[-LIVE_EDGE_SEGMENTS:]
+            else:
+                segments = [segment for segment in segments if segment[0] > last_sequence]
+
+            if playlist['init_uri'] and not init_written and segments:
+                try:
+                    init_segment = fetch_bytes(playlist['init_uri'])
+                except Exception as e:
+                    # Segments are useless without it: retry on the next playlist reload
+                    segment_errors += 1
+                    print(f"Init segment fetch failed ({segment_errors}/{MAX_SEGMENT_ERRORS}): {e}")
+                    if segment_errors >= MAX_SEGMENT_ERRORS:
+                        reason = 'segments unavailable'
+                        break
+                    stop_event.wait(playlist['target_duration'] / 2)
+                    continue
+                process.stdin.write(init_segment)
+                recorded_bytes += len(init_segment)
+                init_written = True
+
+            limit_reached = False
+            for sequence, segment_duration, segment_uri in segments:
+                if stop_event.is_set():
+                    break
+                try:
+                    data = fetch_bytes(segment_uri)
+                    segment_errors = 0
+                except Exception as e:
+                    segment_errors += 1
+                    skipped_segments += 1
+                    last_sequence = sequence
+                    print(f"Segment {sequence} fetch failed, skipped ({segment_errors}/{MAX_SEGMENT_ERRORS}): {e}")
+                    if segment_errors >= MAX_SEGMENT_ERRORS:
+                        reason = 'segments unavailable'
+                        limit_reached = True
+                        break
+                    continue
+                process.stdin.write(data)
+                process.stdin.flush()
+
+                last_sequence = sequence
+                recorded_duration += segment_duration
+                recorded_bytes += len(data)
+                segment_count += 1
+                if recording_callback:
+                    recording_callback(recorded_duration, recorded_bytes)
+
+                if max_duration and recorded_duration >= max_duration:
+                    reason = 'max duration reached'
+                    limit_reached = True
+                    break
+                if max_bytes and recorded_bytes >= max_bytes:
+                    reason = 'max size reached'
+                    limit_reached = True
+                    break
+
+            if limit_reached:
+                break
+            if playlist['ended']:
+                reason = 'stream ended'
+                break
+
+            # Reload after one target duration, or half of it if nothing new appeared
+            # (HLS spec, section 6.3.4)
+            wait = playlist['target_duration'] if segments else playlist['target_duration'] / 2
+            stop_event.wait(wait)
+    finally:
+        # Closing stdin lets FFmpeg flush the last fragment and exit cleanly
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed with return code {process.returncode}")
+
+    print("\n--------------------------------")
+    print(f"✅ Recording finished ({reason}): {segment_count} segments "
+          f"({skipped_segments} skipped), {recorded_duration:.0f}s, {recorded_bytes / 1024 / 1024:.1f} MB")
+    print("--------------------------------")
+
+    return {
+        'duration': recorded_duration,
+        'bytes': recorded_bytes,
+        'segments': segment_count,
+        'skipped_segments': skipped_segments,
+        'reason': reason,
+    }
+
+
+def record_renditions_with_ffmpeg(video_url: str, audio_url: str, output_filename: str,
+                                  stop_event: threading.Event, max_duration: float = None,
+                                  max_bytes: int = None, recording_callback=None) -> dict:
+    """
+    Records a live video playlist and its separate audio rendition with FFmpeg's own HLS
+    demuxer, muxing both into a fragmented MP4. Segment fetching (and its retries) is left
+    to FFmpeg; progress is reported from the elapsed time and the output size.
+
+    Returns:
+        The same dictionary as record_live_hls() (segment counts are not known: 0)
+    """
+    ffmpeg_command = [
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-i', video_url,
+        '-i', audio_url,
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c', 'copy',
+        *(['-t', str(max_duration)] if max_duration else []),
+        *(['-fs', str(max_bytes)] if max_bytes else []),
+        '-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4',
+        output_filename
+    ]
+    process = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE)
+    started = time.monotonic()
+    reason = 'stream ended'
+
+    try:
+        while process.poll() is None:
+            if stop_event.wait(1):
+                reason = 'stopped'
+                break
+            if recording_callback and os.path.exists(output_filename):
+                recording_callback(time.monotonic() - started, os.path.getsize(output_filename))
+    finally:
+        if process.poll() is None:
+            # 'q' makes FFmpeg finish the last fragment and exit cleanly
+            try:
+                process.stdin.write(b'q')
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+                process.wait()
+
+    recorded_duration = time.monotonic() - started
+    recorded_bytes = os.path.getsize(output_filename) if os.path.exists(output_filename) else 0
+    if reason != 'stopped':
+        if max_duration and recorded_duration >= max_duration - 1:
+            reason = 'max duration reached'
+        elif max_bytes and recorded_bytes >= max_bytes * 0.99:
+            reason = 'max size reached'
+    if process.returncode != 0 and reason != 'stopped':
+        raise RuntimeError(f"FFmpeg failed with return code {process.returncode}")
+
+    print(f"✅ Recording finished ({reason}): {recorded_duration:.0f}s, {recorded_bytes / 1024 / 1024:.1f} MB")
+    return {
+        'duration': recorded_duration,
+        'bytes': recorded_bytes,
+        'segments': 0,
+        'skipped_segments': 0,
+        'reason': reason,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print(f"Usage: python {sys.argv[0]} <LIVE_M3U8_URL> <OUTPUT_FILENAME.mp4> [MAX_SECONDS]")
+        print("\nPress Ctrl+C to stop the recording.")
+        sys.exit(1)
+
+    stop = threading.Event()
+    limit = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    recorder = threading.Thread(target=record_live_hls, args=(sys.argv[1], sys.argv[2], stop, limit))
+    recorder.start()
+    try:
+        while recorder.is_alive():
+            recorder.join(0.5)
+    except KeyboardInterrupt:
+        print("\nStopping recording...")
+        stop.set()
+        recorder.join()
@@ -0,0 +1,514 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ('autosave', 'browse', 'upload', 'mixed')
+# Operations that store data on the server, used for the disk bytes per write
+WRITE_OPERATIONS = ('save-game', 'delete-game', 'upload-image')
+# Weights of the user actions in the mixed scenario
+MIXED_WEIGHTS = {
+    'autosave': 6,
+    'browse': 3,
+    'upload': 1,
+}
+PERCENTILES = (50, 90, 95, 99)
+REQUEST_TIMEOUT = 30
+STARTUP_TIMEOUT = 30
+
+# Started as a subprocess in an empty working directory, so games/ and static/uploads/
+# of the run are isolated from the real ones. The folders are made absolute because
+# send_from_directory() resolves relative folders against the app's root path, not the cwd.
+SERVER_LAUNCHER = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+module = __import__(sys.argv[2])
+module.GAMES_FOLDER = os.path.abspath(module.GAMES_FOLDER)
+module.UPLOAD_FOLDER = os.path.abspath(module.UPLOAD_FOLDER)
+module.app.run(host='127.0.0.1', port=int(sys.argv[3]), threaded=True, debug=False)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_png(width: int, height: int, rng: random.Random) -> bytes:
+    """Builds a valid RGB PNG with noisy pixels (so it doesn't compress to nothing)."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rows = b''.join(b'\0' + rng.randbytes(width * 3) for _ in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(rows, 1)) + chunk(b'IEND', b''))
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    """Serves /image/<n>.png from a fixed pool of images, standing in for a remote image host."""
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        name = os.path.basename(urllib.parse.urlparse(self.path).path)
+        try:
+            image = self.server.images[int(name.split('.')[0]) % len(self.server.images)]
+        except ValueError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(image)))
+        self.end_headers()
+        self.wfile.write(image)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_image_host(images: list, latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHostHandler)
+    server.daemon_threads = True
+    server.images = images
+    server.latency = latency
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def start_server(module: str, data_dir: str):
+    """Starts app.py or server.py on a free port; returns (process, base_url)."""
+    port = free_port()
+    log = open(os.path.join(data_dir, 'server.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_LAUNCHER, REPO_DIR, module, str(port)],
+        cwd=data_dir, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{module}.py exited during startup, see {log.name}")
+        try:
+            urllib.request.urlopen(f"{base_url}/list-game-versions/startup-probe", timeout=1).read()
+            return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{module}.py did not start within {STARTUP_TIMEOUT}s")
+
+
+def http_request(method: str, url: str, body: bytes = None, headers: dict = None):
+    """Sends one request; returns (status, body). Connection errors return status 0."""
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, b''
+
+
+def probe_endpoints(base_url: str) -> dict:
+    """
+    Checks which of the game-creator endpoints the target implements (app.py and server.py
+    don't expose exactly the same set). A missing route answers with Flask's HTML 404.
+    """
+    def exists(method, path):
+        req = urllib.request.Request(base_url + path, method=method)
+        try:
+            urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT).read()
+            return True
+        except urllib.error.HTTPError as e:
+            return e.code != 404 or 'json' in e.headers.get('Content-Type', '')
+
+    return {
+        'save-game': True,
+        'list-game-versions': True,
+        'get-game': True,
+        'delete-game': exists('DELETE', '/delete-game/probe/probe.html'),
+        'upload-image': exists('POST', '/upload-image'),
+        'proxy-image': exists('GET', '/proxy-image'),
+    }
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def process_write_bytes(pid: int):
+    """Bytes the process caused to be written to storage (Linux /proc/<pid>/io), or None."""
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class Stats:
+    """Thread-safe latency and error collection per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.misses = {}
+
+    def record(self, operation: str, seconds: float, ok: bool, missed: bool = False):
+        with self.lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+            if not ok:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+            if missed:
+                self.misses[operation] = self.misses.get(operation, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for operation, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            count = len(ordered)
+            errors = self.errors.get(operation, 0)
+            entry = {
+                'count': count,
+                'errors': errors,
+                'error_rate': round(errors / count, 4),
+                # Expected 404s (version pruned between listing and loading), not errors
+                'misses': self.misses.get(operation, 0),
+                'throughput_rps': round(count / elapsed, 2),
+                'latency_ms': {
+                    'mean': round(sum(ordered) / count * 1000, 2),
+                    'max': round(ordered[-1] * 1000, 2),
+                },
+            }
+            for p in PERCENTILES:
+                index = min(count - 1, max(0, int(round(p / 100 * count)) - 1))
+                entry['latency_ms'][f'p{p}'] = round(ordered[index] * 1000, 2)
+            result[operation] = entry
+        return result
+
+
+class VirtualUser:
+    """
+    One simulated editor. Each owns a game that it autosaves (small edits to a large
+    HTML document, like the game creator does), browses its own and other users' versions,
+    and uploads images. All randomness comes from a per-user seeded generator.
+    """
+
+    def __init__(self, index: int, config, stats: Stats, endpoints: dict, image_host: str, run_id: str):
+        self.index = index
+        self.config = config
+        self.stats = stats
+        self.endpoints = endpoints
+        self.image_host = image_host
+        self.rng = random.Random(config.seed * 1000 + index)
+        self.game_id = f"loadtest-{run_id}-{index}"
+        self.run_id = run_id
+        self.clock = datetime(2025, 1, 1) + timedelta(days=index)
+        self.saved_versions = []
+        self.lines = self._initial_document()
+
+    def _initial_document(self) -> list:
+        lines = ['<!DOCTYPE html>', '<html>', '<head>', f'<title>Load test game {self.index}</title>',
+                 '</head>', '<body>', '<script>']
+        size = sum(len(line) + 1 for line in lines)
+        while size < self.config.html_kb * 1024:
+            line = f"  const entity_{len(lines)} = {{ x: {self.rng.randint(0, 800)}, y: {self.rng.randint(0, 600)}, " \
+                   f"speed: {self.rng.random():.4f}, sprite: '{self.rng.randbytes(12).hex()}' }};"
+            lines.append(line)
+            size += len(line) + 1
+        return lines + ['</script>', '</body>', '</html>']
+
+    def _call(self, operation: str, method: str, path: str, body: bytes = None, headers: dict = None,
+              expected_statuses: tuple = ()):
+        start = time.perf_counter()
+        status, data = http_request(method, self.config.base_url + path, body, headers)
+        missed = status in expected_statuses
+        self.stats.record(operation, time.perf_counter() - start, 200 <= status < 300 or missed, missed)
+        return status, data
+
+    def _next_version(self) -> str:
+        # Same format as the game creator: an ISO timestamp with ':' and '.' replaced
+        self.clock += timedelta(milliseconds=self.rng.randint(500, 5000))
+        return self.clock.strftime('%Y-%m-%dT%H-%M-%S-') + f"{self.clock.microsecond // 1000:03d}Z"
+
+    def autosave(self):
+        """A burst of saves (the editor typing), pruning old versions past the keep limit."""
+        for _ in range(self.rng.randint(1, self.config.burst_size)):
+            for _ in range(self.rng.randint(1, 5)):
+                line = self.rng.randrange(7, len(self.lines) - 3)
+                self.lines[line] = f"  const edited_{line} = {self.rng.random():.6f}; // {self.rng.randbytes(6).hex()}"
+            version = self._next_version()
+            body = json.dumps({'html': '\n'.join(self.lines), 'game_id': self.game_id, 'version': version})
+            status, _ = self._call('save-game', 'POST', '/save-game', body.encode('utf-8'),
+                                   {'Content-Type': 'application/json'})
+            if status == 200:
+                self.saved_versions.append(f"{version}.html")
+
+        while self.endpoints['delete-game'] and len(self.saved_versions) > self.config.keep_versions:
+            oldest = self.saved_versions.pop(0)
+            self._call('delete-game', 'DELETE', f"/delete-game/{self.game_id}/{oldest}")
+
+    def browse(self):
+        """Opens the version list of a game and loads a few of its versions."""
+        other = self.rng.randrange(self.config.concurrency)
+        game_id = f"loadtest-{self.run_id}-{other}"
+        status, data = self._call('list-game-versions', 'GET', f"/list-game-versions/{game_id}")
+        versions = json.loads(data).get('versions', []) if status == 200 else []
+        # Open recent versions (the oldest are the next to be pruned by their owner); one
+        # may still be deleted between listing and loading, which is a miss, not an error
+        recent = versions[-max(1, self.config.keep_versions // 2):]
+        for version in self.rng.sample(recent, min(len(recent), self.rng.randint(1, 3))):
+            self._call('get-game', 'GET', f"/get-game/{game_id}/{version}", expected_statuses=(404,))
+
+    def upload(self):
+        """Uploads an image, then loads a remote image through the proxy."""
+        if self.endpoints['upload-image']:
+            image = self.config.images[self.rng.randrange(len(self.config.images))]
+            boundary = uuid.uuid4().hex
+            body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"sprite.png\"\r\n"
+                    f"Content-Type: image/png\r\n\r\n").encode('utf-8') + image + f"\r\n--{boundary}--\r\n".encode('utf-8')
+            self._call('upload-image', 'POST', '/upload-image', body,
+                       {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        if self.endpoints['proxy-image']:
+            url = urllib.parse.quote(f"{self.image_host}/image/{self.rng.randrange(1000)}.png", safe='')
+            self._call('proxy-image', 'GET', f"/proxy-image?url={url}")
+
+    def run(self, scenario: str, deadline: float):
+        actions = {'autosave': self.autosave, 'browse': self.browse, 'upload': self.upload}
+        names = list(MIXED_WEIGHTS)
+        weights = [MIXED_WEIGHTS[name] for name in names]
+        while time.monotonic() < deadline:
+            name = self.rng.choices(names, weights)[0] if scenario == 'mixed' else scenario
+            actions[name]()
+            if self.config.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.config.think_time))
+
+
+def run_scenario(scenario: str, users: list, config, stats: Stats, server_pid, data_dir) -> dict:
+    print(f"Running '{scenario}' with {len(users)} users for {config.duration}s...", file=sys.stderr)
+    stored_before = directory_size(data_dir) if data_dir else None
+    written_before = process_write_bytes(server_pid) if server_pid else None
+
+    start = time.monotonic()
+    deadline = start + config.duration
+    threads = [threading.Thread(target=user.run, args=(scenario, deadline)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    # Let background work triggered by the requests (search index, diff cache) settle
+    time.sleep(config.settle_time)
+    stored_after = directory_size(data_dir) if data_dir else None
+    written_after = process_write_bytes(server_pid) if server_pid else None
+
+    operations = stats.summary(elapsed)
+    total = sum(op['count'] for op in operations.values())
+    writes = sum(operations[name]['count'] for name in WRITE_OPERATIONS if name in operations)
+    errors = sum(op['errors'] for op in operations.values())
+
+    # stored: growth of the data folder; written: bytes the server process wrote to storage
+    # (includes overwritten/deleted data, the search index and the diff cache)
+    disk = {'stored_bytes': None, 'written_bytes': None}
+    if stored_before is not None:
+        disk['stored_bytes'] = stored_after - stored_before
+    if written_before is not None and written_after is not None:
+        disk['written_bytes'] = written_after - written_before
+    for key in ('stored', 'written'):
+        value = disk[f'{key}_bytes']
+        if value is not None:
+            disk[f'{key}_bytes_per_request'] = round(value / total, 1) if total else None
+            disk[f'{key}_bytes_per_write'] = round(value / writes, 1) if writes else None
+
+    return {
+        'duration_s': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'error_rate': round(errors / total, 4) if total else 0,
+        'disk': disk,
+        'operations': operations,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict):
+    """Prints throughput and p95/p99 changes against a previous report (to stderr, next to the progress)."""
+    print(f"Comparing {baseline.get('commit')} -> {current.get('commit')}", file=sys.stderr)
+    for scenario, result in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(scenario)
+        if not old:
+            continue
+        print(f"\n[{scenario}] throughput {old['throughput_rps']} -> {result['throughput_rps']} req/s, "
+              f"errors {old['error_rate']:.2%} -> {result['error_rate']:.2%}", file=sys.stderr)
+        for operation, stats in result['operations'].items():
+            previous = old['operations'].get(operation)
+            if not previous:
+                continue
+            changes = []
+            for key in ('p95', 'p99'):
+                before, after = previous['latency_ms'][key], stats['latency_ms'][key]
+                change = f" ({(after - before) / before:+.0%})" if before else ''
+                changes.append(f"{key} {before} -> {after} ms{change}")
+            print(f"  {operation:20s} " + ', '.join(changes), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test for the game-creator endpoints (/save-game, /list-game-versions, /get-game, "
+                    "/delete-game, /upload-image, /proxy-image)."
+    )
+    parser.add_argument('--app', choices=('app', 'server'), default='app',
+                        help="Flask app to start locally in a temporary directory (default: app)")
+    parser.add_argument('--base-url', help="Test an already running instance instead of starting one")
+    parser.add_argument('--data-dir', help="Working directory of the --base-url instance, to measure stored bytes")
+    parser.add_argument('--server-pid', type=int, help="PID of the --base-url instance, to measure disk writes")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run in order (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--concurrency', type=int, default=8, help="Simultaneous virtual users (default: 8)")
+    parser.add_argument('--duration', type=float, default=15, help="Seconds per scenario (default: 15)")
+    parser.add_argument('--think-time', type=float, default=0,
+                        help="Mean pause between user actions in seconds (default: 0, closed loop)")
+    parser.add_argument('--burst-size', type=int, default=5, help="Maximum saves per autosave burst (default: 5)")
+    parser.add_argument('--keep-versions', type=int, default=20,
+                        help="Versions kept per game before the oldest are deleted (default: 20)")
+    parser.add_argument('--html-kb', type=int, default=200, help="Size of each game document in KB (default: 200)")
+    parser.add_argument('--image-kb', type=int, default=64, help="Approximate size of the images in KB (default: 64)")
+    parser.add_argument('--image-host-latency', type=float, default=0.05,
+                        help="Added latency of the stand-in image host in seconds (default: 0.05)")
+    parser.add_argument('--settle-time', type=float, default=1,
+                        help="Wait after each scenario for background work before measuring disk (default: 1)")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument('--compare', help="Previous JSON report to compare the results with")
+    config = parser.parse_args()
+
+    scenarios = [s.strip() for s in config.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    if config.concurrency < 1 or config.duration <= 0:
+        parser.error("--concurrency and --duration must be positive")
+
+    rng = random.Random(config.seed)
+    side = max(int((config.image_kb * 1024 / 3) ** 0.5), 1)
+    config.images = [make_png(side, side, rng) for _ in range(8)]
+    image_host = start_image_host(config.images, config.image_host_latency)
+    image_host_url = f"http://127.0.0.1:{image_host.server_address[1]}"
+
+    process = None
+    temp_dir = None
+    target = f"{config.app}.py"
+    if config.base_url:
+        config.base_url = config.base_url.rstrip('/')
+        target = config.base_url
+        data_dir = config.data_dir
+        server_pid = config.server_pid
+    else:
+        temp_dir = tempfile.mkdtemp(prefix='load_test_')
+        data_dir = temp_dir
+        print(f"Starting {config.app}.py in {temp_dir}...", file=sys.stderr)
+        process, config.base_url = start_server(config.app, temp_dir)
+        server_pid = process.pid
+
+    try:
+        endpoints = probe_endpoints(config.base_url)
+        skipped = [name for name, available in endpoints.items() if not available]
+        if skipped:
+            print(f"Endpoints not implemented by the target, skipped: {', '.join(skipped)}", file=sys.stderr)
+
+        run_id = f"{config.seed}-{uuid.uuid4().hex[:6]}"
+        users = [VirtualUser(i, config, None, endpoints, image_host_url, run_id) for i in range(config.concurrency)]
+
+        results = {}
+        for scenario in scenarios:
+            stats = Stats()
+            for user in users:
+                user.stats = stats
+            results[scenario] = run_scenario(scenario, users, config, stats, server_pid, data_dir)
+            print(f"  {results[scenario]['requests']} requests, {results[scenario]['throughput_rps']} req/s, "
+                  f"{results[scenario]['error_rate']:.2%} errors", file=sys.stderr)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        image_host.shutdown()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'target': target,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'concurrency': config.concurrency,
+            'duration_s': config.duration,
+            'think_time_s': config.think_time,
+            'burst_size': config.burst_size,
+            'keep_versions': config.keep_versions,
+            'html_kb': config.html_kb,
+            'image_kb': config.image_kb,
+            'image_host_latency_s': config.image_host_latency,
+            'seed': config.seed,
+        },
+        'skipped_endpoints': skipped,
+        'scenarios': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if config.output:
+        with open(config.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"✅ Report written to {config.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if config.compare:
+        with open(config.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,182 @@
 import subprocess
 import sys
 import os
+import re
+import urllib.request
+from urllib.parse import urljoin
 
 # --- Configuration ---
 FFMPEG_PATH = 'ffmpeg' # Assumes 'ffmpeg' is in your system's PATH. 
                        # If not, replace this with the full path to the ffmpeg executable.
+FFPROBE_PATH = 'ffprobe'  # Used when a playlist doesn't declare its audio codec
 
 # --- New Default URL ---
 # The URL provided by the user is used as the default stream source.
 DEFAULT_M3U8_URL = 'https://video.squarespace-cdn.com/content/v1/5f9279271169d63a9f790c2d/6835a230-aa77-4902-8032-797b4c2a0fd2/playlist.m3u8'
 
-def convert_m3u8_to_mp4(m3u8_url: str, output_filename: str):
+# Codec prefixes that mark a variant stream as carrying video
+VIDEO_CODEC_PREFIXES = ('avc1', 'avc3', 'hvc1', 'hev1', 'vp09', 'av01', 'dvh1', 'dvhe')
+
+# Audio codecs (RFC 6381 CODECS prefixes, most specific first) that can be remuxed without
+# transcoding: output extension and extra FFmpeg arguments for the stream copy
+AUDIO_REMUX_FORMATS = (
+    ('mp4a.40.34', '.mp3', []),                         # MP3 signalled as MPEG-4 audio
+    ('mp4a.40', '.m4a', ['-bsf:a', 'aac_adtstoasc']),   # AAC (ADTS in TS segments)
+    ('mp4a.6b', '.mp3', []),
+    ('mp4a.69', '.mp3', []),
+    ('ac-3', '.m4a', []),
+    ('ec-3', '.m4a', []),
+    ('opus', '.opus', []),
+    ('flac', '.flac', []),
+)
+
+# ffprobe codec names, translated to the CODECS form used above
+PROBED_AUDIO_CODECS = {'aac': 'mp4a.40.2', 'mp3': 'mp4a.40.34', 'ac3': 'ac-3', 'eac3': 'ec-3',
+                       'opus': 'opus', 'flac': 'flac'}
+
+
+def parse_m3u8_attributes(line: str) -> dict:
+    """
+    Parses the attribute list of an HLS tag (e.g. #EXT-X-MEDIA) into a dictionary.
+    
+    Args:
+        line: The full tag line from the playlist
+        
+    Returns:
+        A dictionary of attribute names to (unquoted) values
+    """
+    attributes = {}
+    attribute_list = line.split(':', 1)[1] if ':' in line else ''
+    for match in re.finditer(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', attribute_list):
+        attributes[match.group(1)] = match.group(2).strip('"')
+    return attributes
+
+
+def audio_codec_from_codecs(codecs: str):
+    """Returns the audio entry of an HLS CODECS attribute (e.g. 'mp4a.40.2'), or None."""
+    for codec in (c.strip() for c in codecs.split(',')):
+        if codec and not codec.lower().startswith(VIDEO_CODEC_PREFIXES):
+            return codec
+    return None
+
+
+def probe_audio_codec(url: str):
+    """
+    Reads the codec of the first audio stream with ffprobe, for playlists without CODECS.
+    
+    Returns:
+        The codec in CODECS form (e.g. 'mp4a.40.2'), or None if it can't be determined
+    """
+    try:
+        result = subprocess.run(
+            [FFPROBE_PATH, '-v', 'error', '-select_streams', 'a:0',
+             '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', url],
+            capture_output=True, text=True, timeout=60
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Could not probe the audio codec ({e})")
+        return None
+    return PROBED_AUDIO_CODECS.get(result.stdout.strip())
+
+
+def audio_output_format(codec: str):
+    """
+    Chooses how to extract an audio track with the given codec.
+    
+    Returns:
+        (extension, ffmpeg_arguments): a stream copy for codecs listed in AUDIO_REMUX_FORMATS,
+        otherwise (including an unknown codec) a transcode to AAC in an .m4a file
+    """
+    if codec:
+        for prefix, extension, arguments in AUDIO_REMUX_FORMATS:
+            if codec.lower().startswith(prefix):
+                return extension, ['-c:a', 'copy', *arguments]
+    return '.m4a', ['-c:a', 'aac', '-b:a', '192k']
+
+
+def select_audio_source(m3u8_url: str) -> dict:
+    """
+    Picks the playlist to read the audio track from in an HLS master playlist.
+    
+    Preference order: an EXT-X-MEDIA audio rendition (DEFAULT=YES first), an audio-only
+    variant, then the lowest-bandwidth variant (audio is usually shared across variants).
+    Media playlists and unreadable URLs are returned unchanged.
+    
+    Args:
+        m3u8_url: The URL of the M3U8 playlist file.
+        
+    Returns:
+        A dictionary with 'url', 'codec' (the audio codec from CODECS, or None if the
+        playlist doesn't say) and 'muxed' (True if the playlist also carries video)
+    """
+    try:
+        with urllib.request.urlopen(m3u8_url, timeout=10) as response:
+            playlist = response.read().decode('utf-8', errors='replace')
+    except Exception as e:
+        print(f"Could not inspect playlist ({e}), using it as-is")
+        return {'url': m3u8_url, 'codec': None, 'muxed': True}
+    
+    lines = [line.strip() for line in playlist.splitlines() if line.strip()]
+    audio_renditions = []
+    variants = []
+    for index, line in enumerate(lines):
+        if line.startswith('#EXT-X-MEDIA:'):
+            attributes = parse_m3u8_attributes(line)
+            if attributes.get('TYPE') == 'AUDIO' and attributes.get('URI'):
+                audio_renditions.append(attributes)
+        elif line.startswith('#EXT-X-STREAM-INF:') and index + 1 < len(lines):
+            attributes = parse_m3u8_attributes(line)
+            attributes['URI'] = lines[index + 1]
+            variants.append(attributes)
+    
+    if audio_renditions:
+        audio_renditions.sort(key=lambda a: a.get('DEFAULT') != 'YES')
+        rendition = audio_renditions[0]
+        print(f"Using audio rendition: {rendition.get('NAME', 'default')}")
+        # The rendition's codec is declared on the variants that use its group
+        codec = None
+        for variant in variants:
+            if variant.get('AUDIO') == rendition.get('GROUP-ID'):
+                codec = audio_codec_from_codecs(variant.get('CODECS', ''))
+                if codec:
+                    break
+        return {'url': urljoin(m3u8_url, rendition['URI']), 'codec': codec, 'muxed': False}
+    
+    if not variants:
+        # Already a media playlist
+        return {'url': m3u8_url, 'codec': None, 'muxed': True}
+    
+    def has_video(variant):
+        codecs = variant.get('CODECS', '').lower()
+        return 'RESOLUTION' in variant or any(prefix in codecs for prefix in VIDEO_CODEC_PREFIXES)
+    
+    audio_variants = [v for v in variants if not has_video(v)]
+    candidates = audio_variants or variants
+    best = min(candidates, key=lambda v: int(v.get('BANDWIDTH', '0') or 0))
+    return {
+        'url': urljoin(m3u8_url, best['URI']),
+        'codec': audio_codec_from_codecs(best.get('CODECS', '')),
+        'muxed': not audio_variants,
+    }
+
+
+def select_audio_playlist(m3u8_url: str) -> str:
+    """Returns the URL of the playlist to read the audio track from (see select_audio_source)."""
+    return select_audio_source(m3u8_url)['url']
+
+
+def convert_m3u8_to_mp4(m3u8_url: str, output_filename: str, audio_only: bool = False):
     """
     Downloads and converts an M3U8 HLS stream to an MP4 file using FFmpeg.
     
     Args:
         m3u8_url: The URL of the M3U8 playlist file.
         output_filename: The name of the resulting MP4 file.
+        audio_only: Only extract the audio track. It is remuxed when the codec allows it,
+                    and the extension of output_filename is replaced to match the codec
+    
+    Returns:
+        The path of the output file (its extension may differ in audio-only mode)
     """
     print(f"\n--- Starting M3U8 Conversion ---")
     print(f"Source URL: {m3u8_url}")
@@ -34,6 +194,28 @@ def convert_m3u8_to_mp4(m3u8_url: str, output_filename: str):
         '-bsf:a', 'aac_adtstoasc',
         output_filename
     ]
+    
+    if audio_only:
+        source = select_audio_source(m3u8_url)
+        if not source['codec']:
+            source['codec'] = probe_audio_codec(source['url'])
+        extension, audio_arguments = audio_output_format(source['codec'])
+        output_filename = os.path.splitext(output_filename)[0] + extension
+        if source['muxed']:
+            # No separate audio playlist: the (lowest-bandwidth) muxed segments are still
+            # downloaded, only the video track is dropped
+            print("No audio-only rendition, extracting audio from the muxed stream")
+        if audio_arguments[1] != 'copy':
+            print(f"Audio codec {source['codec'] or 'unknown'} can't be remuxed, transcoding to AAC")
+        # -map 0:a:0 -vn: keep the first audio stream only
+        ffmpeg_command = [
+            FFMPEG_PATH,
+            '-i', source['url'],
+            '-map', '0:a:0',
+            '-vn',
+            *audio_arguments,
+            output_filename
+        ]
 
     try:
         # Execute the FFmpeg command
@@ -60,6 +242,8 @@ def convert_m3u8_to_mp4(m3u8_url: str, output_filename: str):
         print("-----------------------------------------------------")
     except Exception as e:
         print(f"\n🚨 An unexpected error occurred: {e}")
+    
+    return output_filename
 
 if __name__ == "__main__":
     # Get the number of arguments (including script name)
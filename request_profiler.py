@@ -0,0 +1,220 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+from flask import Response, g, has_app_context, jsonify, request
+
+# --- Configuration (environment variables) ---
+# Requests slower than this are logged with their stage breakdown
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+# Number of recent requests kept per route for the timing statistics
+WINDOW_SIZE = int(os.environ.get('PROFILER_WINDOW_SIZE', '500'))
+# Interval between stack samples while a profile capture is running
+SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILER_SAMPLE_INTERVAL_MS', '5'))
+# If set, admin endpoints require this value in the X-Admin-Token header;
+# otherwise they only answer requests from localhost
+ADMIN_TOKEN = os.environ.get('PROFILER_ADMIN_TOKEN')
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a named stage of the current request (shown in the slow-request log and
+    the Server-Timing header). Does nothing outside of a profiled request.
+
+    Usage:
+        with stage('read_file'):
+            ...
+    """
+    stages = g.get('profile_stages') if has_app_context() else None
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages.append((name, (time.perf_counter() - start) * 1000))
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Returns the value at the given fraction (0-1) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class RequestProfiler:
+    """
+    Per-request timing and on-demand sampling profiler for a Flask app.
+
+    Records wall and CPU time per route in a rolling window, logs slow requests with
+    their stage breakdown, and can capture a sampling profile of the next N requests
+    (collapsed stacks, ready for flamegraph.pl / speedscope) without restarting.
+    When no capture is running the cost per request is two clock reads.
+
+    Admin endpoints:
+        GET  /admin/profiler/stats     Rolling per-route statistics (JSON)
+        POST /admin/profiler/profile   Start a capture: {"requests": N}
+        GET  /admin/profiler/profile   Capture status, or the collapsed stacks once done
+    """
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.slow_request_ms = slow_request_ms
+        self.timings = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
+        self.lock = threading.Lock()
+
+        # Sampling capture state
+        self.capture_remaining = 0
+        self.capture_threads = set()
+        self.capture_stacks = Counter()
+        self.capture_done = False
+        self.sampler = None
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/admin/profiler/stats', 'profiler_stats', self._stats_view, methods=['GET'])
+        app.add_url_rule('/admin/profiler/profile', 'profiler_profile', self._profile_view,
+                         methods=['GET', 'POST'])
+
+    # --- Request hooks ---
+
+    def _before_request(self):
+        g.profile_start = (time.perf_counter(), time.thread_time())
+        g.profile_stages = []
+
+        if self.capture_remaining > 0 and not request.path.startswith('/admin/profiler'):
+            with self.lock:
+                if self.capture_remaining > 0:
+                    self.capture_remaining -= 1
+                    self.capture_threads.add(threading.get_ident())
+                    g.profile_sampled = True
+
+    def _after_request(self, response):
+        start = g.get('profile_start')
+        if start is None:
+            return response
+
+        wall_ms = (time.perf_counter() - start[0]) * 1000
+        cpu_ms = (time.thread_time() - start[1]) * 1000
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else '<unmatched>'}"
+        stages = g.get('profile_stages') or []
+
+        with self.lock:
+            self.timings[route].append((wall_ms, cpu_ms))
+            if g.get('profile_sampled'):
+                self.capture_threads.discard(threading.get_ident())
+                if self.capture_remaining == 0 and not self.capture_threads:
+                    self.capture_done = True
+
+        timing_entries = [f"total;dur={wall_ms:.1f}", f"cpu;dur={cpu_ms:.1f}"]
+        timing_entries += [f"{name};dur={duration:.1f}" for name, duration in stages]
+        response.headers['Server-Timing'] = ', '.join(timing_entries)
+
+        if wall_ms >= self.slow_request_ms:
+            breakdown = ', '.join(f"{name}={duration:.0f}ms" for name, duration in stages) or 'no stages'
+            print(f"⚠️ SLOW REQUEST: {route} {request.full_path.rstrip('?')} -> {response.status_code} "
+                  f"wall={wall_ms:.0f}ms cpu={cpu_ms:.0f}ms ({breakdown})")
+
+        return response
+
+    # --- Sampling ---
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self.lock:
+                # Checked and cleared together with start_capture()'s lock, so a new capture
+                # either keeps this sampler running or starts a fresh one
+                if self.capture_done:
+                    self.sampler = None
+                    return
+                threads = set(self.capture_threads)
+            if threads:
+                frames = sys._current_frames()
+                for ident in threads:
+                    frame = frames.get(ident)
+                    if frame is None or ident == own_ident:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    self.capture_stacks[';'.join(reversed(stack))] += 1
+            time.sleep(SAMPLE_INTERVAL_MS / 1000)
+
+    def start_capture(self, request_count: int):
+        """Starts sampling the stacks of the next `request_count` requests."""
+        with self.lock:
+            self.capture_remaining = request_count
+            self.capture_threads = set()
+            self.capture_stacks = Counter()
+            self.capture_done = False
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._sample_loop)
+                self.sampler.daemon = True
+                self.sampler.start()
+
+    def collapsed_stacks(self) -> str:
+        """Returns the captured samples in collapsed-stack format ('a;b;c count' per line)."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.capture_stacks.most_common()) + '\n'
+
+    def route_stats(self) -> dict:
+        """Returns count and wall/CPU time percentiles per route over the rolling window."""
+        with self.lock:
+            snapshot = {route: list(samples) for route, samples in self.timings.items()}
+
+        stats = {}
+        for route, samples in snapshot.items():
+            wall = sorted(s[0] for s in samples)
+            cpu = sorted(s[1] for s in samples)
+            stats[route] = {
+                'count': len(samples),
+                'wall_ms': {'p50': round(percentile(wall, 0.5), 1), 'p95': round(percentile(wall, 0.95), 1),
+                            'p99': round(percentile(wall, 0.99), 1), 'max': round(wall[-1], 1)},
+                'cpu_ms': {'p50': round(percentile(cpu, 0.5), 1), 'p95': round(percentile(cpu, 0.95), 1),
+                           'max': round(cpu[-1], 1)},
+            }
+        return stats
+
+    # --- Admin endpoints ---
+
+    def _is_authorized(self) -> bool:
+        if ADMIN_TOKEN:
+            return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+        return request.remote_addr in LOCAL_ADDRESSES
+
+    def _stats_view(self):
+        if not self._is_authorized():
+            return jsonify({'error': 'Forbidden'}), 403
+        return jsonify({'slow_request_ms': self.slow_request_ms, 'routes': self.route_stats()})
+
+    def _profile_view(self):
+        if not self._is_authorized():
+            return jsonify({'error': 'Forbidden'}), 403
+
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            try:
+                request_count = int(data.get('requests', request.args.get('requests', 10)))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid requests parameter'}), 400
+            if request_count <= 0:
+                return jsonify({'error': 'Invalid requests parameter'}), 400
+            self.start_capture(request_count)
+            return jsonify({'message': f'Profiling the next {request_count} requests'}), 202
+
+        if not self.capture_done:
+            return jsonify({
+                'status': 'running' if self.sampler else 'idle',
+                'remaining_requests': self.capture_remaining,
+                'samples': sum(self.capture_stacks.values()),
+            })
+        return Response(self.collapsed_stacks(), mimetype='text/plain')
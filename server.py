@@ -1,18 +1,28 @@
 import os
 import uuid
+from datetime import datetime
 import requests
 from flask import Flask, request, jsonify, send_from_directory, Response, redirect
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
+from static_assets import AssetManifest
+from request_profiler import RequestProfiler, stage
+import game_search
+import game_diff
+import game_archive
 
 app = Flask(__name__)
 CORS(app)
+RequestProfiler(app)
 
 UPLOAD_FOLDER = os.path.join('static', 'uploads')
 GAMES_FOLDER = 'games'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(GAMES_FOLDER, exist_ok=True)
 
+# Bundled single-page app, indexed once at startup and served from memory
+PARIS_TRAM_ASSETS = AssetManifest(os.path.join(app.root_path, 'paris-tram-simulator-3d'))
+
 @app.route('/upload-image', methods=['POST'])
 def upload_image():
     if 'image' not in request.files:
@@ -44,6 +54,8 @@ def save_game():
     file_path = os.path.join(game_dir, filename)
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(html)
+    game_search.queue_index(secure_filename(game_id), filename, file_path)
+    game_diff.precompute_previous_diff(game_dir, filename)
     return jsonify({'success': True, 'path': f"/{GAMES_FOLDER}/{game_id}/{filename}"})
 
 @app.route('/list-game-versions/<game_id>', methods=['GET'])
@@ -55,13 +67,104 @@ def list_game_versions(game_id):
     versions.sort()
     return jsonify({'versions': versions})
 
+@app.route('/search-games', methods=['GET'])
+def search_games():
+    """
+    Full-text search over all saved game versions (game ID, version, title, text and scripts).
+    
+    Query parameters: q (required), limit (default 20, max 100), game_id (optional filter)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing q parameter'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    game_id = request.args.get('game_id')
+    
+    with stage('search'):
+        hits = game_search.search_games(query, limit=limit,
+                                        game_id=secure_filename(game_id) if game_id else None)
+    return jsonify({'query': query, 'results': hits})
+
 @app.route('/get-game/<game_id>/<version>', methods=['GET'])
 def get_game(game_id, version):
     game_dir = os.path.join(GAMES_FOLDER, secure_filename(game_id))
     file_path = os.path.join(game_dir, secure_filename(version))
-    if not os.path.exists(file_path):
-        return "Not found", 404
-    return send_from_directory(game_dir, version)
+    with stage('lookup'):
+        if not os.path.exists(file_path):
+            return "Not found", 404
+    with stage('send'):
+        return send_from_directory(game_dir, version)
+
+@app.route('/diff-game/<game_id>/<from_version>/<to_version>', methods=['GET'])
+def diff_game_versions(game_id, from_version, to_version):
+    """
+    Line diff between two saved versions of a game, computed and cached server-side.
+    
+    Returns JSON hunks by default, or a unified diff with ?format=unified.
+    """
+    game_dir = os.path.join(GAMES_FOLDER, secure_filename(game_id))
+    safe_versions = []
+    for version in (from_version, to_version):
+        safe_version = secure_filename(version if version.endswith('.html') else f"{version}.html")
+        if not os.path.exists(os.path.join(game_dir, safe_version)):
+            return jsonify({'error': f'Game version not found: {version}'}), 404
+        safe_versions.append(safe_version)
+    
+    with stage('diff'):
+        diff = game_diff.get_diff(os.path.join(game_dir, safe_versions[0]),
+                                  os.path.join(game_dir, safe_versions[1]))
+    
+    if request.args.get('format') == 'unified':
+        response = Response(game_diff.format_unified(diff, *safe_versions), mimetype='text/plain')
+    else:
+        response = jsonify({'from': safe_versions[0], 'to': safe_versions[1], **diff})
+    # Same content-hash pair, same diff: let the browser revalidate cheaply
+    response.set_etag(f"{diff['from_hash']}_{diff['to_hash']}_{request.args.get('format', 'json')}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/export-games', methods=['GET'])
+def export_games():
+    """
+    Stream a tar archive of games (all versions plus the uploaded images they use).
+    
+    Query parameters: ids (comma-separated game IDs, default: all games)
+    """
+    ids = request.args.get('ids', '')
+    game_ids = [i.strip() for i in ids.split(',') if i.strip()] or game_archive.list_game_ids(GAMES_FOLDER)
+    
+    response = Response(
+        game_archive.iter_export(game_ids, GAMES_FOLDER, UPLOAD_FOLDER),
+        mimetype='application/x-tar',
+        direct_passthrough=True
+    )
+    response.headers['Content-Disposition'] = f"attachment; filename=games-{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar"
+    return response
+
+@app.route('/import-games', methods=['POST'])
+def import_games():
+    """
+    Import a tar archive created by /export-games (raw request body or an 'archive' file field).
+    
+    Existing files are kept unless ?overwrite=1 is passed.
+    """
+    stream = request.files['archive'].stream if 'archive' in request.files else request.stream
+    overwrite = request.args.get('overwrite') == '1'
+    
+    try:
+        result = game_archive.import_archive(stream, GAMES_FOLDER, UPLOAD_FOLDER, overwrite=overwrite)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    for name in result['imported']:
+        if name.startswith('games/'):
+            _, game_id, version = name.split('/')
+            game_search.queue_index(game_id, version, os.path.join(GAMES_FOLDER, game_id, version))
+    
+    return jsonify({'success': True, **result})
 
 @app.route('/proxy-image', methods=['GET'])
 def proxy_image():
@@ -87,11 +190,11 @@ def serve_paris_tram_redirect():
 
 @app.route('/paris-tram-simulator-3d/')
 def serve_paris_tram_index():
-    return send_from_directory('paris-tram-simulator-3d', 'index.html')
+    return PARIS_TRAM_ASSETS.serve('index.html')
 
 @app.route('/paris-tram-simulator-3d/<path:filename>')
 def serve_paris_tram_files(filename):
-    return send_from_directory('paris-tram-simulator-3d', filename)
+    return PARIS_TRAM_ASSETS.serve(filename)
 
 if __name__ == '__main__':
     app.run(debug=True)
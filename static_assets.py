@@ -0,0 +1,134 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, request, send_from_directory
+
+# Files up to this size are kept in memory; larger ones are streamed from disk
+SMALL_ASSET_BYTES = 1024 * 1024
+# Upper bound for the in-memory cache of one app directory
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Directories that are never part of a served bundle
+SKIPPED_DIRS = {'node_modules', '.git', '__pycache__'}
+
+# Precompressed siblings (e.g. app.js.br), in order of preference
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+# Build tools (Vite, webpack) put a content hash in the filename: index-BXk2a9Qz.js,
+# main.3f9a2b1c.js. Only the last '-'/'.' component before the extension is considered.
+FINGERPRINT_PATTERN = re.compile(r'[.-]([A-Za-z0-9_]{8,})\.[A-Za-z0-9]+$')
+# Descriptive names that look similar but aren't hashes: texture-2048x2048.png
+DIMENSIONS_PATTERN = re.compile(r'^\d+x\d+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def is_fingerprinted(path: str) -> bool:
+    """Checks whether a filename contains a content hash (safe to cache forever)."""
+    match = FINGERPRINT_PATTERN.search(os.path.basename(path))
+    if not match:
+        return False
+    segment = match.group(1)
+    # A hash mixes letters and digits; words, years and dimensions don't (enough)
+    digits = sum(c.isdigit() for c in segment)
+    letters = sum(c.isalpha() for c in segment)
+    return digits >= 2 and letters >= 2 and not DIMENSIONS_PATTERN.match(segment)
+
+
+class AssetManifest:
+    """
+    Manifest of a bundled app directory built once at startup.
+
+    Every file is recorded with its size, content hash, mimetype and precompressed
+    variants. Small files are kept in memory, so serving them (including conditional
+    requests answered with 304) doesn't touch the disk.
+    """
+
+    def __init__(self, root: str):
+        # Pass an absolute path (e.g. under app.root_path): relative ones resolve against the cwd
+        self.root = os.path.abspath(root)
+        self.assets = {}
+        self.cached_bytes = 0
+        self.build()
+
+    def build(self):
+        """Walks the app directory and (re)builds the manifest and the in-memory cache."""
+        assets = {}
+        cached_bytes = 0
+
+        if os.path.isdir(self.root):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS]
+                for filename in sorted(filenames):
+                    full_path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                    with open(full_path, 'rb') as f:
+                        data = f.read()
+
+                    asset = {
+                        'path': full_path,
+                        'size': len(data),
+                        'hash': hashlib.sha256(data).hexdigest()[:32],
+                        'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                        'variants': {},
+                        'data': None,
+                    }
+                    if asset['size'] <= SMALL_ASSET_BYTES and cached_bytes + asset['size'] <= MAX_CACHE_BYTES:
+                        asset['data'] = data
+                        cached_bytes += asset['size']
+                    assets[rel_path] = asset
+
+        # Link precompressed siblings to the file they encode
+        for rel_path, asset in assets.items():
+            for encoding, suffix in PRECOMPRESSED_VARIANTS:
+                variant = assets.get(rel_path + suffix)
+                if variant:
+                    asset['variants'][encoding] = variant
+
+        self.assets = assets
+        self.cached_bytes = cached_bytes
+        print(f"Asset manifest for {self.root}: {len(assets)} files, "
+              f"{cached_bytes / 1024 / 1024:.1f} MB cached in memory")
+
+    def serve(self, filename: str) -> Response:
+        """
+        Serves a file of the app directory.
+
+        Fingerprinted files get immutable long-lived caching, everything else (including
+        index.html) must be revalidated with its ETag. Files that appeared after startup
+        fall back to send_from_directory.
+        """
+        asset = self.assets.get(filename)
+        if asset is None:
+            return send_from_directory(self.root, filename)
+
+        served = asset
+        encoding = None
+        accepted = request.accept_encodings
+        for candidate, _ in PRECOMPRESSED_VARIANTS:
+            if candidate in asset['variants'] and accepted[candidate]:
+                served = asset['variants'][candidate]
+                encoding = candidate
+                break
+
+        if served['data'] is not None:
+            response = Response(served['data'], mimetype=asset['mimetype'])
+            response.set_etag(served['hash'])
+            response.make_conditional(request, accept_ranges=True, complete_length=served['size'])
+        else:
+            # Large file: send_file streams it and handles conditional/range requests itself
+            response = send_from_directory(self.root, os.path.relpath(served['path'], self.root),
+                                           mimetype=asset['mimetype'], etag=served['hash'])
+
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset['variants']:
+            response.headers['Vary'] = 'Accept-Encoding'
+
+        response.headers['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if is_fingerprinted(filename) else REVALIDATE_CACHE_CONTROL
+        )
+        return response
@@ -0,0 +1,210 @@
+import json
+import math
+import os
+import queue
+import subprocess
+import threading
+
+# --- Configuration ---
+FFMPEG_PATH = 'ffmpeg'    # Assumes 'ffmpeg' is in your system's PATH.
+FFPROBE_PATH = 'ffprobe'  # Assumes 'ffprobe' is in your system's PATH.
+
+POSTER_WIDTH = 1280
+THUMB_WIDTH = 320
+SPRITE_TILE_WIDTH = 160
+SPRITE_TILE_HEIGHT = 90
+SPRITE_COLUMNS = 10
+SPRITE_MAX_TILES = 100
+SPRITE_MIN_INTERVAL = 2  # Seconds between preview tiles for short videos
+
+# Files produced for every download, served by /api/thumb/<task_id>/<name>
+THUMBNAIL_FILES = ('poster.jpg', 'thumb.jpg', 'sprite.jpg', 'sprite.vtt')
+
+# A single worker so a burst of completed downloads doesn't start one FFmpeg each
+_job_queue = queue.Queue()
+_queued = set()
+_queued_lock = threading.Lock()
+_worker = None
+
+
+def get_thumbnail_dir(filepath: str) -> str:
+    """Returns the directory holding the cached thumbnails of a downloaded file (next to the file)."""
+    return f"{filepath}.thumbs"
+
+
+def is_ready(filepath: str) -> bool:
+    """Checks whether all thumbnail files of a download have been generated."""
+    return os.path.exists(os.path.join(get_thumbnail_dir(filepath), '.done'))
+
+
+def is_unavailable(filepath: str) -> bool:
+    """
+    Checks whether thumbnails can't be made for a download: it has no video stream
+    (.novideo) or generation failed (.failed). Neither case is retried.
+    """
+    thumb_dir = get_thumbnail_dir(filepath)
+    return (os.path.exists(os.path.join(thumb_dir, '.novideo')) or
+            os.path.exists(os.path.join(thumb_dir, '.failed')))
+
+
+def _write_marker(filepath: str, marker: str):
+    thumb_dir = get_thumbnail_dir(filepath)
+    os.makedirs(thumb_dir, exist_ok=True)
+    open(os.path.join(thumb_dir, marker), 'w').close()
+
+
+def format_vtt_timestamp(seconds: float) -> str:
+    """Formats seconds as a WebVTT timestamp (HH:MM:SS.mmm)."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+
+def build_sprite_vtt(duration: float, interval: float, tile_count: int) -> str:
+    """
+    Builds the WebVTT index mapping time ranges to tiles of the seek-preview sprite.
+
+    Args:
+        duration: Total duration in seconds
+        interval: Seconds covered by each tile
+        tile_count: Number of tiles in the sprite sheet
+
+    Returns:
+        The WebVTT document as a string
+    """
+    lines = ['WEBVTT', '']
+    for index in range(tile_count):
+        start = index * interval
+        end = min((index + 1) * interval, duration)
+        x = (index % SPRITE_COLUMNS) * SPRITE_TILE_WIDTH
+        y = (index // SPRITE_COLUMNS) * SPRITE_TILE_HEIGHT
+        lines.append(f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}")
+        lines.append(f"sprite.jpg#xywh={x},{y},{SPRITE_TILE_WIDTH},{SPRITE_TILE_HEIGHT}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def generate_thumbnails(filepath: str) -> bool:
+    """
+    Generates the poster, thumbnail and seek-preview sprite of a video in one FFmpeg pass.
+
+    Only keyframes are decoded (-skip_frame nokey), which is enough for previews and
+    avoids decoding the whole video.
+
+    Args:
+        filepath: Path to the downloaded video file
+
+    Returns:
+        True if the thumbnails were generated, False for files without a video stream
+    """
+    probe_output = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=codec_type:format=duration', '-of', 'json', filepath],
+        check=True, capture_output=True, text=True
+    ).stdout
+    probe = json.loads(probe_output or '{}')
+    if not probe.get('streams'):
+        print(f"No video stream in {filepath}, skipping thumbnails")
+        _write_marker(filepath, '.novideo')
+        return False
+
+    duration = float(probe.get('format', {}).get('duration') or 0)
+    interval = max(duration / SPRITE_MAX_TILES, SPRITE_MIN_INTERVAL)
+    tile_count = max(1, min(SPRITE_MAX_TILES, math.ceil(duration / interval)))
+    rows = math.ceil(tile_count / SPRITE_COLUMNS)
+    poster_time = duration * 0.1
+
+    thumb_dir = get_thumbnail_dir(filepath)
+    os.makedirs(thumb_dir, exist_ok=True)
+
+    # split: one decode feeds all three outputs
+    # select: first keyframe after 10% of the video (skips black intro frames),
+    # with a fallback to the first keyframe below when there is none
+    # fps + tile: one tile every `interval` seconds, letterboxed into a fixed grid
+    filter_graph = (
+        "[0:v]split=3[p][t][s];"
+        f"[p]select='gte(t,{poster_time:.3f})',scale={POSTER_WIDTH}:-2[poster];"
+        f"[t]select='gte(t,{poster_time:.3f})',scale={THUMB_WIDTH}:-2[thumb];"
+        f"[s]fps=1/{interval:.3f},"
+        f"scale={SPRITE_TILE_WIDTH}:{SPRITE_TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={SPRITE_TILE_WIDTH}:{SPRITE_TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={SPRITE_COLUMNS}x{rows}[sprite]"
+    )
+
+    ffmpeg_command = [
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-skip_frame', 'nokey',
+        '-i', filepath,
+        '-filter_complex', filter_graph,
+        '-map', '[poster]', '-frames:v', '1', '-q:v', '3', os.path.join(thumb_dir, 'poster.jpg'),
+        '-map', '[thumb]', '-frames:v', '1', '-q:v', '5', os.path.join(thumb_dir, 'thumb.jpg'),
+        '-map', '[sprite]', '-frames:v', '1', '-q:v', '5', os.path.join(thumb_dir, 'sprite.jpg'),
+    ]
+    subprocess.run(ffmpeg_command, check=True, capture_output=True)
+
+    # Short clips (e.g. Twitter GIFs) may have no keyframe after 10%: use the first one
+    if not os.path.exists(os.path.join(thumb_dir, 'poster.jpg')) or \
+            not os.path.exists(os.path.join(thumb_dir, 'thumb.jpg')):
+        fallback_command = [
+            FFMPEG_PATH, '-v', 'error', '-y',
+            '-skip_frame', 'nokey',
+            '-i', filepath,
+            '-filter_complex', f"[0:v]split=2[p][t];[p]scale={POSTER_WIDTH}:-2[poster];"
+                               f"[t]scale={THUMB_WIDTH}:-2[thumb]",
+            '-map', '[poster]', '-frames:v', '1', '-q:v', '3', os.path.join(thumb_dir, 'poster.jpg'),
+            '-map', '[thumb]', '-frames:v', '1', '-q:v', '5', os.path.join(thumb_dir, 'thumb.jpg'),
+        ]
+        subprocess.run(fallback_command, check=True, capture_output=True)
+
+    with open(os.path.join(thumb_dir, 'sprite.vtt'), 'w', encoding='utf-8') as f:
+        f.write(build_sprite_vtt(duration, interval, tile_count))
+
+    missing = [name for name in THUMBNAIL_FILES if not os.path.exists(os.path.join(thumb_dir, name))]
+    if missing:
+        raise RuntimeError(f"FFmpeg produced no {', '.join(missing)}")
+
+    open(os.path.join(thumb_dir, '.done'), 'w').close()
+    return True
+
+
+def _worker_loop():
+    while True:
+        filepath = _job_queue.get()
+        try:
+            if not is_ready(filepath) and not is_unavailable(filepath):
+                print(f"Generating thumbnails for {filepath}")
+                generate_thumbnails(filepath)
+        except Exception as e:
+            print(f"🚨 ERROR: Thumbnail generation failed for {filepath}: {e}")
+            # Don't run FFmpeg again on every thumbnail request for this file
+            _write_marker(filepath, '.failed')
+        finally:
+            with _queued_lock:
+                _queued.discard(filepath)
+            _job_queue.task_done()
+
+
+def queue_thumbnails(filepath: str):
+    """
+    Queues thumbnail generation for a downloaded file on the background worker.
+
+    Files that are already generated, already queued or can't get thumbnails are ignored.
+    """
+    global _worker
+
+    if is_ready(filepath) or is_unavailable(filepath):
+        return
+
+    with _queued_lock:
+        if filepath in _queued:
+            return
+        _queued.add(filepath)
+
+        if _worker is None:
+            _worker = threading.Thread(target=_worker_loop)
+            _worker.daemon = True
+            _worker.start()
+
+    _job_queue.put(filepath)
@@ -1,6 +1,10 @@
 import yt_dlp
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of media items of one post downloaded at the same time
+MAX_PARALLEL_ITEMS = 4
 
 
 def sanitize_filename(filename: str) -> str:
@@ -25,16 +29,28 @@ def sanitize_filename(filename: str) -> str:
     return filename
 
 
-def download_twitter_video(url: str, output_dir: str = "downloads", progress_callback=None) -> dict:
+def download_twitter_video(url: str, output_dir: str = "downloads", progress_callback=None,
+                           audio_only: bool = False, ratelimit_provider=None,
+                           item_progress_callback=None) -> dict:
     """
-    Downloads a Twitter/X video at the best quality up to 1080p in MP4 format.
+    Downloads every video/GIF of a Twitter/X post at the best quality up to 1080p in MP4 format.
+    
+    Posts with several media entries are fetched in parallel within the same call.
     
     Args:
         url: The Twitter/X video URL
         output_dir: Directory where the video will be saved (default: "downloads")
+        progress_callback: Optional callback(percentage) with the overall progress
+        audio_only: Only fetch the audio track and remux it to m4a without transcoding
+        ratelimit_provider: Optional callable returning the current download rate limit
+                            in bytes/sec (None for unlimited), re-read during the download
+        item_progress_callback: Optional callback(index, percentage) with per-item progress
         
     Returns:
-        A dictionary with 'success' (bool), 'filepath' (str), and 'message' (str)
+        A dictionary with 'success' (bool), 'filepath' (str, the first downloaded file),
+        'message' (str) and 'files' (list of {'index', 'filepath', 'size', 'title', 'error'}
+        for every item; failed items have 'filepath' None and the reason in 'error').
+        The download only fails if no item could be downloaded.
     """
     print(f"\n--- Starting Twitter/X Download ---")
     print(f"URL: {url}")
@@ -42,15 +58,6 @@ def download_twitter_video(url: str, output_dir: str = "downloads", progress_cal
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Progress hook for yt-dlp
-    def progress_hook(d):
-        if progress_callback and d['status'] == 'downloading':
-            total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-            downloaded = d.get('downloaded_bytes', 0)
-            if total > 0:
-                percentage = (downloaded / total) * 100
-                progress_callback(percentage)
-    
     # Configure yt-dlp options for Twitter
     ydl_opts = {
         'format': 'best[height<=1080][ext=mp4]/best[height<=1080]/best',
@@ -68,49 +75,132 @@ def download_twitter_video(url: str, output_dir: str = "downloads", progress_cal
                 'api': ['syndication', 'graphql']
             }
         },
-        'progress_hooks': [progress_hook],
     }
     
+    if audio_only:
+        # Twitter HLS exposes separate audio renditions; fall back to extracting from the muxed file
+        ydl_opts['format'] = 'bestaudio/best[height<=480]/best'
+        del ydl_opts['merge_output_format']
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best',
+        }]
+    
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             # Extract video info first
             print("\nExtracting video information...")
             info = ydl.extract_info(url, download=False)
+        
+        # A post with several videos/GIFs is returned as a playlist of entries
+        if info.get('_type') == 'playlist':
+            entries = [entry for entry in (info.get('entries') or []) if entry]
+        else:
+            entries = [info]
+        if not entries:
+            raise Exception("No video could be found in this tweet")
+        
+        # Create a meaningful filename
+        uploader = info.get('uploader') or entries[0].get('uploader') or 'twitter_user'
+        video_id = info.get('id', 'video')
+        description = info.get('description') or entries[0].get('description') or ''
+        
+        # Try to create a meaningful title from description (first 50 chars)
+        if description:
+            title_part = description[:50].replace('\n', ' ').strip()
+            sanitized_title = sanitize_filename(f"{uploader}_{title_part}_{video_id}")
+        else:
+            sanitized_title = sanitize_filename(f"{uploader}_{video_id}")
+        
+        print(f"Uploader: {uploader}")
+        print(f"Video ID: {video_id}")
+        print(f"Media items: {len(entries)}")
+        
+        # Per-item completed fraction; items that haven't started count as 0
+        item_fractions = [0.0] * len(entries)
+        
+        def download_item(index, entry):
+            def progress_hook(d):
+                # Follow the job's current share of the upstream bandwidth, split between items
+                if ratelimit_provider:
+                    limit = ratelimit_provider()
+                    item_opts['ratelimit'] = limit // len(entries) if limit else None
+                if d['status'] != 'downloading':
+                    return
+                total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
+                downloaded = d.get('downloaded_bytes', 0)
+                if total > 0:
+                    item_fractions[index] = min(downloaded / total, 1.0)
+                    if item_progress_callback:
+                        item_progress_callback(index, item_fractions[index] * 100)
+                    if progress_callback:
+                        progress_callback(sum(item_fractions) / len(entries) * 100)
             
-            # Create a meaningful filename
-            uploader = info.get('uploader', 'twitter_user')
-            video_id = info.get('id', 'video')
-            description = info.get('description', '')
-            
-            # Try to create a meaningful title from description (first 50 chars)
-            if description:
-                title_part = description[:50].replace('\n', ' ').strip()
-                sanitized_title = sanitize_filename(f"{uploader}_{title_part}_{video_id}")
-            else:
-                sanitized_title = sanitize_filename(f"{uploader}_{video_id}")
-            
-            print(f"Uploader: {uploader}")
-            print(f"Video ID: {video_id}")
-            
-            # Update output template with sanitized filename
-            ydl_opts['outtmpl'] = os.path.join(output_dir, f'{sanitized_title}.%(ext)s')
-            
-            # Download the video
-            print("\nDownloading video...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                ydl_download.download([url])
-            
-            output_file = os.path.join(output_dir, f'{sanitized_title}.mp4')
+            # Single-media posts keep the plain name; multi-media posts get a numeric suffix
+            name = sanitized_title if len(entries) == 1 else f"{sanitized_title}_{index + 1}"
+            item_opts = dict(ydl_opts)
+            item_opts['outtmpl'] = os.path.join(output_dir, f'{name}.%(ext)s')
+            item_opts['progress_hooks'] = [progress_hook]
+            if ratelimit_provider:
+                limit = ratelimit_provider()
+                item_opts['ratelimit'] = limit // len(entries) if limit else None
             
-            print("\n--------------------------------")
-            print(f"✅ Success! Video saved to: {os.path.abspath(output_file)}")
-            print("--------------------------------")
+            # The entry is already extracted: only format selection and download remain
+            with yt_dlp.YoutubeDL(item_opts) as ydl_download:
+                downloaded_info = ydl_download.process_ie_result(dict(entry), download=True)
             
+            # The extension depends on the selected format / postprocessor (mp4, m4a, ...)
+            output_file = os.path.abspath(downloaded_info['requested_downloads'][0]['filepath'])
+            if item_progress_callback:
+                item_progress_callback(index, 100)
             return {
-                'success': True,
-                'filepath': os.path.abspath(output_file),
-                'message': f'Successfully downloaded Twitter video from @{uploader}'
+                'index': index,
+                'filepath': output_file,
+                'size': os.path.getsize(output_file),
+                'title': entry.get('title') or name,
+                'error': None,
             }
+        
+        # Download the video(s)
+        print("\nDownloading audio..." if audio_only else "\nDownloading video...")
+        with ThreadPoolExecutor(max_workers=min(len(entries), MAX_PARALLEL_ITEMS)) as executor:
+            futures = [executor.submit(download_item, index, entry) for index, entry in enumerate(entries)]
+        
+        # One failed item doesn't discard the others
+        files = []
+        first_error = None
+        for index, future in enumerate(futures):
+            try:
+                files.append(future.result())
+            except Exception as e:
+                first_error = first_error or e
+                print(f"🚨 ERROR: Item {index + 1} of {len(entries)} failed: {e}")
+                files.append({
+                    'index': index,
+                    'filepath': None,
+                    'size': 0,
+                    'title': entries[index].get('title') or f"{sanitized_title}_{index + 1}",
+                    'error': str(e),
+                })
+        
+        downloaded = [item for item in files if item['filepath']]
+        if not downloaded:
+            raise first_error
+        
+        print("\n--------------------------------")
+        for item in downloaded:
+            print(f"✅ Success! {'Audio' if audio_only else 'Video'} saved to: {item['filepath']}")
+        print("--------------------------------")
+        
+        media_count = f"{len(downloaded)} videos" if len(downloaded) > 1 else "video"
+        failed_count = len(files) - len(downloaded)
+        return {
+            'success': True,
+            'filepath': downloaded[0]['filepath'],
+            'files': files,
+            'message': f'Successfully downloaded Twitter {media_count} from @{uploader}'
+                       + (f' ({failed_count} failed)' if failed_count else '')
+        }
             
     except Exception as e:
         error_msg = str(e)
@@ -25,13 +25,17 @@ def sanitize_filename(filename: str) -> str:
     return filename
 
 
-def download_youtube_video(url: str, output_dir: str = "downloads", progress_callback=None) -> dict:
+def download_youtube_video(url: str, output_dir: str = "downloads", progress_callback=None,
+                           audio_only: bool = False, ratelimit_provider=None) -> dict:
     """
     Downloads a YouTube video at the best quality up to 1080p in MP4 format.
     
     Args:
         url: The YouTube video URL
         output_dir: Directory where the video will be saved (default: "downloads")
+        audio_only: Only fetch the audio track and remux it to m4a/opus without transcoding
+        ratelimit_provider: Optional callable returning the current download rate limit
+                            in bytes/sec (None for unlimited), re-read during the download
         
     Returns:
         A dictionary with 'success' (bool), 'filepath' (str), and 'message' (str)
@@ -44,6 +48,9 @@ def download_youtube_video(url: str, output_dir: str = "downloads", progress_cal
     
     # Progress hook for yt-dlp
     def progress_hook(d):
+        # Follow the job's current share of the upstream bandwidth
+        if ratelimit_provider:
+            ydl_opts['ratelimit'] = ratelimit_provider()
         if progress_callback and d['status'] == 'downloading':
             total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
             downloaded = d.get('downloaded_bytes', 0)
@@ -66,6 +73,18 @@ def download_youtube_video(url: str, output_dir: str = "downloads", progress_cal
         'progress_hooks': [progress_hook],
     }
     
+    if ratelimit_provider:
+        ydl_opts['ratelimit'] = ratelimit_provider()
+    
+    if audio_only:
+        # Audio-only formats, no video merge; 'best' keeps the source codec (stream copy)
+        ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
+        del ydl_opts['merge_output_format']
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best',
+        }]
+    
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             # Extract video info first
@@ -82,14 +101,18 @@ def download_youtube_video(url: str, output_dir: str = "downloads", progress_cal
             ydl_opts['outtmpl'] = os.path.join(output_dir, f'{sanitized_title}.%(ext)s')
             
             # Download the video
-            print("\nDownloading video...")
+            print("\nDownloading audio..." if audio_only else "\nDownloading video...")
             with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                ydl_download.download([url])
+                downloaded_info = ydl_download.extract_info(url, download=True)
             
-            output_file = os.path.join(output_dir, f'{sanitized_title}.mp4')
+            if audio_only:
+                # The extension depends on the source codec (m4a, opus, ...)
+                output_file = downloaded_info['requested_downloads'][0]['filepath']
+            else:
+                output_file = os.path.join(output_dir, f'{sanitized_title}.mp4')
             
             print("\n--------------------------------")
-            print(f"✅ Success! Video saved to: {os.path.abspath(output_file)}")
+            print(f"✅ Success! {'Audio' if audio_only else 'Video'} saved to: {os.path.abspath(output_file)}")
             print("--------------------------------")
             
             return {